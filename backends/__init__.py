@@ -0,0 +1,3 @@
+# Shared backends that turn perilib protocol definitions into implementation
+# code. Each generator script builds its protocol tree from the vendor sources
+# and then hands it to the backends selected on its command line.
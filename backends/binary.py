@@ -0,0 +1,217 @@
+"""Compact binary definition format with lazy per-protocol loading.
+
+Layout (all integers little-endian):
+
+    header      magic "PRLD", uint16 version, uint16 protocol count,
+                uint32 offset and length of the top-level metadata
+    index       per protocol: uint16 ID length, ID (UTF-8),
+                uint32 offset and length of the protocol block
+    protocol    uint32 metadata length, metadata, uint16 class count, then
+                per class: uint8 group (0 commands, 1 events), uint16 class
+                ID, uint32 offset and length of the class block
+    blocks      compact JSON for metadata and each class
+
+Offsets are absolute, so a loader can memory-map the file and decode only the
+protocol and classes it actually touches.
+"""
+
+from collections import OrderedDict
+from collections.abc import Mapping
+import json
+import mmap
+import struct
+
+MAGIC = b"PRLD"
+VERSION = 1
+
+GROUPS = ["commands", "events"]
+
+_header = struct.Struct("<4sHHII")
+_index_id_length = struct.Struct("<H")
+_extent = struct.Struct("<II")
+_uint32 = struct.Struct("<I")
+_uint16 = struct.Struct("<H")
+_class_entry = struct.Struct("<BHII")
+
+
+def _encode(value):
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _decode(data):
+    return json.loads(bytes(data).decode("utf-8"), object_pairs_hook=OrderedDict)
+
+
+def _protocol_metadata(protocol):
+    # everything except the class entities, which get blocks of their own
+    metadata = OrderedDict()
+    for key in protocol:
+        if key != "packets":
+            metadata[key] = protocol[key]
+    packets = OrderedDict()
+    for group in protocol.get("packets", {}):
+        packets[group] = OrderedDict((key, value) for key, value in protocol["packets"][group].items() if key != "entities")
+    metadata["packets"] = packets
+    return metadata
+
+
+def encode_definitions(json_definition):
+    """Encode a definition tree into the binary format."""
+    protocols = json_definition.get("protocols", OrderedDict())
+    metadata = _encode(OrderedDict((key, value) for key, value in json_definition.items() if key != "protocols"))
+
+    # protocol blocks are laid out relative to their own start first
+    blocks = []
+    for protocol_id in protocols:
+        protocol = protocols[protocol_id]
+        protocol_metadata = _encode(_protocol_metadata(protocol))
+        classes = []
+        for group_index, group in enumerate(GROUPS):
+            entities = protocol.get("packets", {}).get(group, {}).get("entities", {})
+            for class_id in entities:
+                classes.append((group_index, int(class_id), _encode(entities[class_id])))
+        blocks.append((protocol_id.encode("utf-8"), protocol_metadata, classes))
+
+    index_length = sum(_index_id_length.size + len(protocol_id) + _extent.size for protocol_id, _, _ in blocks)
+    offset = _header.size + index_length
+    metadata_offset = offset
+    offset += len(metadata)
+
+    index = []
+    body = [metadata]
+    for protocol_id, protocol_metadata, classes in blocks:
+        start = offset
+        table_length = _uint32.size + len(protocol_metadata) + _uint16.size + len(classes) * _class_entry.size
+        class_offset = start + table_length
+        parts = [_uint32.pack(len(protocol_metadata)), protocol_metadata, _uint16.pack(len(classes))]
+        for group_index, class_id, data in classes:
+            parts.append(_class_entry.pack(group_index, class_id, class_offset, len(data)))
+            class_offset += len(data)
+        parts.extend(data for _, _, data in classes)
+        block = b"".join(parts)
+        index.append(_index_id_length.pack(len(protocol_id)) + protocol_id + _extent.pack(start, len(block)))
+        body.append(block)
+        offset += len(block)
+
+    header = _header.pack(MAGIC, VERSION, len(blocks), metadata_offset, len(metadata))
+    return header + b"".join(index) + b"".join(body)
+
+
+class LazyEntities(Mapping):
+    """Class ID to class definition mapping that decodes each class on first access."""
+
+    def __init__(self, buffer, extents):
+        self._buffer = buffer
+        self._extents = extents
+        self._classes = {}
+
+    def __getitem__(self, class_id):
+        class_def = self._classes.get(class_id)
+        if class_def is None:
+            offset, length = self._extents[class_id]
+            class_def = _decode(self._buffer[offset:offset + length])
+            self._classes[class_id] = class_def
+        return class_def
+
+    def __iter__(self):
+        return iter(self._extents)
+
+    def __len__(self):
+        return len(self._extents)
+
+
+class BinaryDefinitions(object):
+    """Memory-mapped reader for the binary definition format."""
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, metadata_offset, metadata_length = _header.unpack_from(self._buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a binary perilib definition file" % filename)
+        if version != VERSION:
+            raise ValueError("unsupported binary definition version %d" % version)
+        self._metadata_extent = (metadata_offset, metadata_length)
+
+        # the index is tiny, so it is decoded eagerly
+        self._index = OrderedDict()
+        offset = _header.size
+        for _ in range(count):
+            length, = _index_id_length.unpack_from(self._buffer, offset)
+            offset += _index_id_length.size
+            protocol_id = bytes(self._buffer[offset:offset + length]).decode("utf-8")
+            offset += length
+            self._index[protocol_id] = _extent.unpack_from(self._buffer, offset)
+            offset += _extent.size
+        self._protocols = {}
+
+    def close(self):
+        self._buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def protocol_ids(self):
+        return list(self._index)
+
+    def metadata(self):
+        offset, length = self._metadata_extent
+        return _decode(self._buffer[offset:offset + length])
+
+    def protocol(self, protocol_id):
+        """Return one protocol definition; its classes are decoded lazily."""
+        protocol = self._protocols.get(protocol_id)
+        if protocol is not None:
+            return protocol
+
+        offset, _ = self._index[protocol_id]
+        metadata_length, = _uint32.unpack_from(self._buffer, offset)
+        offset += _uint32.size
+        protocol = _decode(self._buffer[offset:offset + metadata_length])
+        offset += metadata_length
+        class_count, = _uint16.unpack_from(self._buffer, offset)
+        offset += _uint16.size
+
+        extents = [OrderedDict() for _ in GROUPS]
+        for _ in range(class_count):
+            group_index, class_id, class_offset, class_length = _class_entry.unpack_from(self._buffer, offset)
+            extents[group_index][str(class_id)] = (class_offset, class_length)
+            offset += _class_entry.size
+
+        packets = protocol.setdefault("packets", OrderedDict())
+        for group_index, group in enumerate(GROUPS):
+            if group in packets or extents[group_index]:
+                packets.setdefault(group, OrderedDict())["entities"] = LazyEntities(self._buffer, extents[group_index])
+
+        self._protocols[protocol_id] = protocol
+        return protocol
+
+
+def _materialize(value):
+    if isinstance(value, Mapping):
+        return OrderedDict((key, _materialize(value[key])) for key in value)
+    if isinstance(value, list):
+        return [_materialize(item) for item in value]
+    return value
+
+
+def check_definitions(json_definition, filename):
+    """Verify every protocol in a binary file decodes back to the JSON tree; return a list of failures."""
+    failures = []
+    with BinaryDefinitions(filename) as definitions:
+        expected = json.loads(json.dumps(json_definition))
+        decoded = _materialize(definitions.metadata())
+        decoded["protocols"] = OrderedDict((protocol_id, _materialize(definitions.protocol(protocol_id))) for protocol_id in definitions.protocol_ids())
+        for protocol_id in expected.get("protocols", {}):
+            if protocol_id not in decoded["protocols"]:
+                failures.append("%s: missing from binary definitions" % protocol_id)
+            elif json.loads(json.dumps(decoded["protocols"][protocol_id])) != expected["protocols"][protocol_id]:
+                failures.append("%s: binary definitions differ from JSON" % protocol_id)
+        expected.pop("protocols", None)
+        decoded.pop("protocols")
+        if json.loads(json.dumps(decoded)) != expected:
+            failures.append("top-level metadata differs from JSON")
+    return failures
@@ -0,0 +1,318 @@
+"""Template-driven C backend for heap-free embedded hosts.
+
+Renders const packed descriptor tables, a switch-based class/ID dispatcher,
+a frame parser that validates lengths, checksums and the technology type in
+place, and fixed-offset accessors that read fields straight out of the
+receive buffer.
+Also renders a harness that feeds generated frames through the parser on the
+build host.
+"""
+
+from collections import OrderedDict
+import os
+import shutil
+import string
+import subprocess
+import tempfile
+
+from backends import datatypes
+from backends.dispatch import dispatch_index
+from backends.framing import build_frame, frame_checksum
+from backends.struct_codec import sample_args
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "templates", "c")
+
+C_TYPES = OrderedDict([
+    ("B", "uint8_t"),
+    ("b", "int8_t"),
+    ("H", "uint16_t"),
+    ("h", "int16_t"),
+    ("I", "uint32_t"),
+    ("i", "int32_t"),
+])
+
+
+def _template(filename):
+    with open(os.path.join(TEMPLATE_DIR, filename), "r") as f:
+        return string.Template(f.read())
+
+
+def type_constant(type_name):
+    return "PERILIB_TYPE_%s" % type_name.upper()
+
+
+def _read_expression(code, offset):
+    # little-endian reads, one byte at a time so alignment never matters
+    size = datatypes.type_size(code)
+    ctype = C_TYPES[code]
+    if size == 1:
+        return "(%s)payload[%d]" % (ctype, offset)
+    parts = ["(uint32_t)payload[%d]" % offset] + ["((uint32_t)payload[%d] << %d)" % (offset + i, i * 8) for i in range(1, size)]
+    return "(%s)(%s)" % (ctype, " | ".join(parts))
+
+
+def _c_literal(code, value):
+    if value < 0:
+        # keep the most negative value expressible without overflow
+        return "(%d - 1)" % (value + 1)
+    return "%du" % value if code.isupper() else "%d" % value
+
+
+def _bytes_literal(data):
+    return "\"%s\"" % "".join("\\x%02X" % byte for byte in data)
+
+
+def _render_accessors(codec):
+    lines = []
+    layout = codec["layout"]
+    for field in layout["fields"]:
+        if datatypes.is_integer(field["code"]):
+            lines.append("static inline %s %s_%s(const uint8_t *payload) { return %s; }" % (
+                C_TYPES[field["code"]], codec["name"], field["name"], _read_expression(field["code"], field["offset"])))
+        else:
+            lines.append("static inline const uint8_t *%s_%s(const uint8_t *payload) { return payload + %d; }" % (
+                codec["name"], field["name"], field["offset"]))
+    tail = layout["tail"]
+    if tail is not None:
+        lines.append("static inline uint16_t %s_%s_length(const uint8_t *payload) { return %s; }" % (
+            codec["name"], tail["name"], _read_expression(tail["code"], tail["offset"])))
+        lines.append("static inline const uint8_t *%s_%s(const uint8_t *payload) { return payload + %d; }" % (
+            codec["name"], tail["name"], layout["fixed_length"]))
+    return lines
+
+
+def _render_protocol(prefix, packets, framing):
+    field_lines = []
+    packet_lines = []
+    name_lines = []
+    case_lines = []
+    field_count = 0
+    for index, codec in enumerate(packets):
+        layout = codec["layout"]
+        for field in layout["fields"]:
+            field_lines.append("    { %d, %s }, /* %s.%s */" % (field["offset"], type_constant(field["type"]), codec["name"], field["name"]))
+        tail_prefix_length = datatypes.type_size(layout["tail"]["code"]) if layout["tail"] is not None else 0
+        packet_lines.append("    { %d, %d, %d, %d, PERILIB_KIND_%s, %d, %d }, /* %s */" % (
+            field_count, layout["fixed_length"], len(layout["fields"]), tail_prefix_length,
+            codec["kind"].upper(), codec["class_id"], codec["packet_id"], codec["name"]))
+        name_lines.append("    \"%s\"," % codec["name"])
+        case_lines.append("    case 0x%05Xu: return &%s_packets[%d];" % (
+            dispatch_index(codec["kind"], codec["class_id"], codec["packet_id"]), prefix, index))
+        field_count += len(layout["fields"])
+
+    if not field_lines:
+        # C does not allow empty initializers
+        field_lines.append("    { 0, 0 },")
+
+    declaration = "\n".join([
+        "",
+        "/* %s */" % prefix,
+        "#define %s_PACKET_COUNT %d" % (prefix.upper(), len(packets)),
+        "#define %s_TYPE_VALUE 0x%02Xu" % (prefix.upper(), framing.get("type_value", 0)),
+        "extern const perilib_field_t %s_fields[];" % prefix,
+        "extern const perilib_packet_t %s_packets[%s_PACKET_COUNT];" % (prefix, prefix.upper()),
+        "#ifdef PERILIB_PACKET_NAMES",
+        "extern const char *const %s_packet_names[%s_PACKET_COUNT];" % (prefix, prefix.upper()),
+        "#endif",
+        "const perilib_packet_t *%s_lookup(uint8_t kind, uint8_t class_id, uint8_t packet_id);" % prefix,
+        "int %s_parse(const uint8_t *frame, uint16_t length, uint8_t outgoing, perilib_frame_t *out);" % prefix,
+        "",
+    ])
+
+    definition = "\n".join([
+        "",
+        "/* %s */" % prefix,
+        "",
+        "const perilib_field_t %s_fields[] = {" % prefix,
+    ] + field_lines + [
+        "};",
+        "",
+        "const perilib_packet_t %s_packets[%s_PACKET_COUNT] = {" % (prefix, prefix.upper()),
+    ] + packet_lines + [
+        "};",
+        "",
+        "#ifdef PERILIB_PACKET_NAMES",
+        "const char *const %s_packet_names[%s_PACKET_COUNT] = {" % (prefix, prefix.upper()),
+    ] + name_lines + [
+        "};",
+        "#endif",
+        "",
+        "const perilib_packet_t *%s_lookup(uint8_t kind, uint8_t class_id, uint8_t packet_id)" % prefix,
+        "{",
+        "    switch (((uint32_t)kind << 16) | ((uint32_t)class_id << 8) | packet_id) {",
+    ] + case_lines + [
+        "    default: return 0;",
+        "    }",
+        "}",
+        "",
+        "int %s_parse(const uint8_t *frame, uint16_t length, uint8_t outgoing, perilib_frame_t *out)" % prefix,
+        "{",
+        "    return parse_frame(frame, length, outgoing, %s_TYPE_VALUE, %s_lookup, out);" % (prefix.upper(), prefix),
+        "}",
+        "",
+    ])
+    return declaration, definition
+
+
+def _with_footer(data, framing):
+    # append the checksum footer, if the framing has one
+    if framing["footer_length"]:
+        return bytes(data) + bytes([frame_checksum(framing, data)])
+    return bytes(data)
+
+
+def _render_checks(prefix, packets, framing):
+    lines = []
+    known = set()
+    for index, codec in enumerate(packets):
+        known.add((codec["kind"], codec["class_id"], codec["packet_id"]))
+        values = sample_args(codec["args"], 1)
+        frame = build_frame(codec, framing, values)
+        outgoing = 1 if codec["kind"] == "command" else 0
+        name = codec["name"]
+        # string literals carry a terminating NUL, hence "sizeof(data) - 1";
+        # a failed parse leaves the previously parsed frame untouched
+        lines += [
+            "    { /* %s */" % name,
+            "        static const uint8_t data[] = %s;" % _bytes_literal(frame),
+            "        CHECK(%s_parse(data, sizeof(data) - 2, %d, &frame) == PERILIB_ERR_INCOMPLETE, \"%s: truncated\");" % (prefix, outgoing, name),
+            "        CHECK(%s_parse(data, sizeof(data) - 1, %d, &frame) == PERILIB_OK, \"%s: parse\");" % (prefix, outgoing, name),
+            "        CHECK(frame.packet == &%s_packets[%d], \"%s: lookup\");" % (prefix, index, name),
+        ]
+        for field in codec["layout"]["fields"]:
+            value = values[field["name"]]
+            if datatypes.is_integer(field["code"]):
+                condition = "%s_%s(frame.payload) == %s" % (name, field["name"], _c_literal(field["code"], value))
+            else:
+                condition = "memcmp(%s_%s(frame.payload), %s, %d) == 0" % (name, field["name"], _bytes_literal(value), len(value))
+            lines.append("        CHECK(%s, \"%s.%s\");" % (condition, name, field["name"]))
+        tail = codec["layout"]["tail"]
+        if tail is not None:
+            value = values[tail["name"]]
+            lines.append("        CHECK(%s_%s_length(frame.payload) == %d, \"%s.%s length\");" % (name, tail["name"], len(value), name, tail["name"]))
+            lines.append("        CHECK(memcmp(%s_%s(frame.payload), %s, %d) == 0, \"%s.%s\");" % (name, tail["name"], _bytes_literal(value), len(value), name, tail["name"]))
+        elif frame[1] < 0xFF:
+            # one extra payload byte must be rejected for fixed-size packets
+            oversized = bytearray(frame[:-framing["footer_length"]] if framing["footer_length"] else frame)
+            oversized[1] += 1
+            oversized += bytes(1)
+            oversized = _with_footer(oversized, framing)
+            lines.append("        {")
+            lines.append("            static const uint8_t oversized[] = %s;" % _bytes_literal(oversized))
+            lines.append("            CHECK(%s_parse(oversized, sizeof(oversized) - 1, %d, &frame) == PERILIB_ERR_LENGTH, \"%s: oversized\");" % (prefix, outgoing, name))
+            lines.append("        }")
+        if framing["footer_length"]:
+            # a corrupted checksum must be rejected even though everything else is valid
+            corrupted = bytearray(frame)
+            corrupted[-1] ^= 0xFF
+            lines.append("        {")
+            lines.append("            static const uint8_t corrupted[] = %s;" % _bytes_literal(corrupted))
+            lines.append("            CHECK(%s_parse(corrupted, sizeof(corrupted) - 1, %d, &frame) == PERILIB_ERR_CHECKSUM, \"%s: bad checksum\");" % (prefix, outgoing, name))
+            lines.append("        }")
+        lines.append("    }")
+
+    if framing.get("type_mask") and packets:
+        # the first packet's frame with its lowest type bit flipped belongs to
+        # another technology and must be rejected
+        codec = packets[0]
+        frame = bytearray(build_frame(codec, framing, sample_args(codec["args"], 1)))
+        frame[0] ^= framing["type_mask"] & -framing["type_mask"]
+        if framing["footer_length"]:
+            frame = _with_footer(frame[:-framing["footer_length"]], framing)
+        lines += [
+            "    { /* %s for another technology */" % codec["name"],
+            "        static const uint8_t data[] = %s;" % _bytes_literal(frame),
+            "        CHECK(%s_parse(data, sizeof(data) - 1, %d, &frame) == PERILIB_ERR_UNKNOWN, \"%s: other technology\");" % (
+                prefix, 1 if codec["kind"] == "command" else 0, codec["name"]),
+            "    }",
+        ]
+
+    # an ID that no packet uses must be rejected without touching the payload
+    for class_id in range(256):
+        if ("event", class_id, 255) not in known:
+            header = _with_footer(bytes([framing["event_value"] | framing.get("type_value", 0), 0, class_id, 255]), framing)
+            lines += [
+                "    { /* %s unknown event */" % prefix,
+                "        static const uint8_t data[] = %s;" % _bytes_literal(header),
+                "        CHECK(%s_parse(data, sizeof(data) - 1, 0, &frame) == PERILIB_ERR_UNKNOWN, \"%s: unknown\");" % (prefix, prefix),
+                "    }",
+            ]
+            break
+    return lines
+
+
+def render(codecs, prefixes, framings, name):
+    """Render the C sources; returns an OrderedDict of filename to text.
+
+    framings maps each protocol ID to its framing; all of them share one
+    frame layout and differ at most in their type_value.
+    """
+    type_enum = ["    PERILIB_TYPE_NONE = 0"]
+    for type_name in list(datatypes.FIXED_TYPES) + list(datatypes.ARRAY_TYPES):
+        type_enum.append("    %s" % type_constant(type_name))
+
+    declarations = []
+    definitions = []
+    accessors = []
+    checks = []
+    frame_count = 0
+    accessor_names = set()
+    for protocol_id in codecs:
+        prefix = prefixes[protocol_id]
+        declaration, definition = _render_protocol(prefix, codecs[protocol_id], framings[protocol_id])
+        declarations.append(declaration)
+        definitions.append(definition)
+        for codec in codecs[protocol_id]:
+            for line in _render_accessors(codec):
+                accessor = line.split("(")[0].split()[-1].lstrip("*")
+                if accessor in accessor_names:
+                    raise ValueError("duplicate C accessor name '%s'" % accessor)
+                accessor_names.add(accessor)
+                accessors.append(line)
+        checks += _render_checks(prefix, codecs[protocol_id], framings[protocol_id])
+        frame_count += len(codecs[protocol_id])
+
+    framing = next(iter(framings.values()))
+    substitutions = {
+        "source_name": name,
+        "name": name,
+        "guard": "%s_TABLES_H" % name.upper(),
+        "type_enum": ",\n".join(type_enum),
+        "declarations": "".join(declarations),
+        "accessors": "\n".join(accessors) + "\n",
+        "definitions": "".join(definitions),
+        "header_length": framing["header_length"],
+        "footer_length": framing["footer_length"],
+        "checksum_initial": "0x%02X" % framing.get("checksum_initial", 0),
+        "length_high_mask": "0x%02X" % framing["length_high_mask"],
+        "event_mask": "0x%02X" % framing["event_mask"],
+        "event_value": "0x%02X" % framing["event_value"],
+        "type_mask": "0x%02X" % framing.get("type_mask", 0),
+        "checks": "\n".join(checks) + "\n",
+        "frame_count": frame_count,
+    }
+    return OrderedDict([
+        ("%s_tables.h" % name, _template("tables.h.tmpl").substitute(substitutions)),
+        ("%s_tables.c" % name, _template("tables.c.tmpl").substitute(substitutions)),
+        ("%s_harness.c" % name, _template("harness.c.tmpl").substitute(substitutions)),
+    ])
+
+
+def check_harness(directory, name):
+    """Compile and run the generated harness on the host; return (ran, failures)."""
+    compiler = os.environ.get("CC") or shutil.which("cc") or shutil.which("gcc")
+    if compiler is None:
+        return False, []
+    with tempfile.TemporaryDirectory() as build_dir:
+        executable = os.path.join(build_dir, "%s_harness" % name)
+        command = [compiler, "-std=c99", "-Wall", "-Wextra", "-Werror", "-DPERILIB_PACKET_NAMES",
+                   "-I", directory, os.path.join(directory, "%s_tables.c" % name),
+                   os.path.join(directory, "%s_harness.c" % name), "-o", executable]
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        if result.returncode != 0:
+            return True, ["compile: %s" % line for line in result.stdout.splitlines()]
+        result = subprocess.run([executable], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        print(result.stdout.strip())
+        if result.returncode != 0:
+            return True, [line for line in result.stdout.splitlines() if line.startswith("FAILED")]
+    return True, []
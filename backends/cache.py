@@ -0,0 +1,77 @@
+"""Content-hashed cache of parsed API sources and change-only output writes."""
+
+import hashlib
+import os
+import pickle
+import time
+
+
+class SourceCache(object):
+    """Cache parsed sources keyed by the generator version and source bytes."""
+
+    def __init__(self, directory, version):
+        self.directory = directory
+        self.version = version
+
+    def _key(self, data):
+        digest = hashlib.sha256()
+        digest.update(self.version.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(data)
+        return digest.hexdigest()
+
+    def load(self, filename, parse):
+        """Return (parsed, hit, elapsed seconds) for a source file.
+
+        The file is only passed to parse() if no cache entry matches its
+        current content; stale entries for the same file are removed.
+        """
+        start = time.perf_counter()
+        with open(filename, "rb") as f:
+            key = self._key(f.read())
+        base = os.path.basename(filename)
+        entry = os.path.join(self.directory, "%s.%s.pickle" % (base, key))
+
+        if os.path.exists(entry):
+            with open(entry, "rb") as f:
+                parsed = pickle.load(f)
+            return parsed, True, time.perf_counter() - start
+
+        parsed = parse(filename)
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):
+            if name.startswith(base + ".") and name.endswith(".pickle"):
+                os.remove(os.path.join(self.directory, name))
+        with open(entry + ".tmp", "wb") as f:
+            pickle.dump(parsed, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(entry + ".tmp", entry)
+        return parsed, False, time.perf_counter() - start
+
+
+def load_uncached(filename, parse):
+    """Return (parsed, None, elapsed seconds), bypassing the cache; None marks the load as uncached."""
+    start = time.perf_counter()
+    parsed = parse(filename)
+    return parsed, None, time.perf_counter() - start
+
+
+def cache_status(hit):
+    return "uncached" if hit is None else "hit" if hit else "miss"
+
+
+def write_if_changed(filename, data):
+    """Write text or bytes to filename only if the bytes differ; return True if written.
+
+    The data goes to a temporary file that then replaces filename, so an
+    interrupted run never leaves a truncated output behind.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if os.path.exists(filename):
+        with open(filename, "rb") as f:
+            if f.read() == data:
+                return False
+    with open(filename + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(filename + ".tmp", filename)
+    return True
@@ -0,0 +1,84 @@
+"""Wire layout of the BGAPI and EZ-Serial argument datatypes."""
+
+from collections import OrderedDict
+import struct
+
+# all multi-byte values are little-endian on the wire
+BYTE_ORDER = "<"
+
+# fixed-size datatypes: struct format code
+FIXED_TYPES = OrderedDict([
+    ("uint8", "B"),
+    ("int8", "b"),
+    ("uint16", "H"),
+    ("int16", "h"),
+    ("uint32", "I"),
+    ("int32", "i"),
+    ("bd_addr", "6s"),
+    ("macaddr", "6s"),
+    ("hw_addr", "6s"),
+    ("ipv4", "4s"),
+    ("uuid_128", "16s"),
+    ("aes_key_128", "16s"),
+])
+
+# variable-length byte arrays: struct format code of the length prefix
+ARRAY_TYPES = OrderedDict([
+    ("uint8array", "B"),
+    ("uint16array", "H"),
+    ("uint8a", "B"),
+    ("longuint8a", "H"),
+])
+
+
+def type_size(code):
+    return struct.calcsize(BYTE_ORDER + code)
+
+
+def is_integer(code):
+    return not code.endswith("s")
+
+
+def integer_range(code):
+    """Return the (minimum, maximum) value representable by an integer format code."""
+    bits = type_size(code) * 8
+    if code.islower():
+        return -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+    return 0, (1 << bits) - 1
+
+
+def packet_layout(args):
+    """Compute the static layout of an argument list.
+
+    Returns an OrderedDict with the fixed-size "fields" (name, type, code and
+    byte offset of each), the struct "format" covering them plus the array
+    length prefix, and the trailing variable-length "tail" argument (or None).
+    Raises ValueError if the layout cannot be determined statically.
+    """
+    fields = []
+    tail = None
+    offset = 0
+    for arg in args:
+        if tail is not None:
+            raise ValueError("argument '%s' follows variable-length argument '%s'" % (arg["name"], tail["name"]))
+        if arg["type"] in FIXED_TYPES:
+            code = FIXED_TYPES[arg["type"]]
+            fields.append(OrderedDict([("name", arg["name"]), ("type", arg["type"]), ("code", code), ("offset", offset)]))
+            offset += type_size(code)
+        elif arg["type"] in ARRAY_TYPES:
+            code = ARRAY_TYPES[arg["type"]]
+            tail = OrderedDict([("name", arg["name"]), ("type", arg["type"]), ("code", code), ("offset", offset)])
+            offset += type_size(code)
+        else:
+            raise ValueError("unknown datatype '%s' for argument '%s'" % (arg["type"], arg["name"]))
+
+    codes = [field["code"] for field in fields]
+    if tail is not None:
+        codes.append(tail["code"])
+
+    return OrderedDict([
+        ("fields", fields),
+        ("tail", tail),
+        ("format", BYTE_ORDER + "".join(codes)),
+        ("fixed_length", offset),
+    ])
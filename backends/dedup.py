@@ -0,0 +1,83 @@
+"""Share identical packet definitions between protocols.
+
+Packets whose normalized definition is identical in more than one protocol
+are stored once in a top-level pool and referenced from each protocol by
+digest. resolve_shared() expands the references again; by default every
+reference resolves to the same pooled object, so loading several protocols
+into one process keeps a single copy of each shared packet.
+"""
+
+from collections import OrderedDict
+import copy
+import hashlib
+import json
+
+# top-level pool of shared packet definitions, keyed by digest
+POOL_KEY = "shared_packets"
+
+# key of a packet entry that refers to the pool
+REF_KEY = "shared"
+
+
+def packet_digest(packet_def):
+    normalized = json.dumps(packet_def, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def _iter_packet_entries(protocol):
+    for group in ["commands", "events"]:
+        entities = protocol.get("packets", {}).get(group, {}).get("entities", {})
+        for class_id in entities:
+            class_def = entities[class_id]
+            for packet_id in class_def:
+                if packet_id.isdigit():
+                    yield class_def, packet_id
+
+
+def share_packets(json_definition):
+    """Return (pooled copy of the definition, sharing report).
+
+    The report maps each protocol ID to (shared packets, total packets).
+    """
+    pooled = copy.deepcopy(json_definition)
+    protocols = pooled.get("protocols", OrderedDict())
+
+    # count the protocols each distinct packet definition appears in
+    users = {}
+    for protocol_id in protocols:
+        for class_def, packet_id in _iter_packet_entries(protocols[protocol_id]):
+            users.setdefault(packet_digest(class_def[packet_id]), set()).add(protocol_id)
+
+    pool = OrderedDict()
+    report = OrderedDict()
+    for protocol_id in protocols:
+        shared = total = 0
+        for class_def, packet_id in _iter_packet_entries(protocols[protocol_id]):
+            total += 1
+            digest = packet_digest(class_def[packet_id])
+            if len(users[digest]) > 1:
+                shared += 1
+                pool.setdefault(digest, class_def[packet_id])
+                class_def[packet_id] = OrderedDict([(REF_KEY, digest)])
+        report[protocol_id] = (shared, total)
+
+    pooled[POOL_KEY] = OrderedDict((digest, pool[digest]) for digest in sorted(pool))
+    return pooled, report
+
+
+def resolve_shared(json_definition, copy_packets=False):
+    """Expand pool references in place and drop the pool.
+
+    With copy_packets, each reference gets its own copy so the protocols
+    can be modified independently.
+    """
+    pool = json_definition.pop(POOL_KEY, None)
+    if pool is None:
+        return json_definition
+    for protocol_id in json_definition.get("protocols", {}):
+        for class_def, packet_id in _iter_packet_entries(json_definition["protocols"][protocol_id]):
+            packet_def = class_def[packet_id]
+            if REF_KEY in packet_def and len(packet_def) == 1:
+                shared = pool[packet_def[REF_KEY]]
+                class_def[packet_id] = copy.deepcopy(shared) if copy_packets else shared
+    return json_definition
@@ -0,0 +1,31 @@
+"""Helpers for walking perilib protocol definition trees."""
+
+from collections import OrderedDict
+
+# argument list key for each packet kind
+ARG_KEYS = OrderedDict([
+    ("command", "command_args"),
+    ("response", "response_args"),
+    ("event", "event_args"),
+])
+
+
+def iter_packet_defs(protocol):
+    """Yield (kind, class_id, class_name, packet_id, packet_def) for every packet."""
+    for group, kinds in (("commands", ("command", "response")), ("events", ("event",))):
+        entities = protocol["packets"][group]["entities"]
+        for class_id in sorted((key for key in entities if key.isdigit()), key=int):
+            class_def = entities[class_id]
+            for packet_id in sorted((key for key in class_def if key.isdigit()), key=int):
+                packet_def = class_def[packet_id]
+                for kind in kinds:
+                    # commands without a response have no "response_args" key
+                    if ARG_KEYS[kind] not in packet_def:
+                        continue
+                    yield kind, int(class_id), class_def["name"], int(packet_id), packet_def
+
+
+def iter_packets(protocol):
+    """Yield (kind, class_id, class_name, packet_id, packet_name, args) for every packet."""
+    for kind, class_id, class_name, packet_id, packet_def in iter_packet_defs(protocol):
+        yield kind, class_id, class_name, packet_id, packet_def["name"], packet_def[ARG_KEYS[kind]]
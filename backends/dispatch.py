@@ -0,0 +1,92 @@
+"""Dense dispatch table backend.
+
+Emits one flat table per protocol, indexed directly by the packet type and
+the class/ID header bytes, so a received header resolves to its packet
+descriptor with a single list index. Every slot without a known packet holds
+the shared UNKNOWN_PACKET descriptor instead of raising on lookup.
+"""
+
+# packet type component of the dispatch index
+PACKET_TYPES = {
+    "command": 0,
+    "response": 1,
+    "event": 2,
+}
+
+# slots per protocol: packet type, class ID byte, packet ID byte
+TABLE_SIZE = len(PACKET_TYPES) << 16
+
+
+def dispatch_index(kind, class_id, packet_id):
+    return (PACKET_TYPES[kind] << 16) | (class_id << 8) | packet_id
+
+
+def render_tables(codecs, framing):
+    """Render the dispatch table section of a codec module."""
+    lines = [
+        "",
+        "# packet type component of the dispatch index",
+    ]
+    for kind in PACKET_TYPES:
+        lines.append("PACKET_TYPE_%s = %d" % (kind.upper(), PACKET_TYPES[kind]))
+    lines += [
+        "",
+        "# header byte 0 identifies events: (header[0] & EVENT_MASK) == EVENT_VALUE",
+        "EVENT_MASK = 0x%02X" % framing["event_mask"],
+        "EVENT_VALUE = 0x%02X" % framing["event_value"],
+        "",
+        "# (name, pack, unpack) descriptor stored in every unassigned slot",
+        "UNKNOWN_PACKET = (\"unknown\", None, None)",
+        "",
+        "_DISPATCH_ENTRIES = {",
+    ]
+    for protocol_id in codecs:
+        lines.append("    \"%s\": (" % protocol_id)
+        for codec in codecs[protocol_id]:
+            lines.append("        (0x%05X, \"%s\", %s_pack, %s_unpack)," % (
+                dispatch_index(codec["kind"], codec["class_id"], codec["packet_id"]),
+                codec["name"], codec["name"], codec["name"]))
+        lines.append("    ),")
+    lines += [
+        "}",
+        "",
+        "_dispatch_tables = {}",
+        "",
+        "def dispatch_table(protocol_id):",
+        "    # tables are expanded on first use so a process only pays for its own protocol",
+        "    table = _dispatch_tables.get(protocol_id)",
+        "    if table is None:",
+        "        table = [UNKNOWN_PACKET] * %d" % TABLE_SIZE,
+        "        for index, name, pack, unpack in _DISPATCH_ENTRIES[protocol_id]:",
+        "            table[index] = (name, pack, unpack)",
+        "        _dispatch_tables[protocol_id] = table",
+        "    return table",
+        "",
+        "def dispatch_index(header, outgoing=False):",
+        "    if header[0] & EVENT_MASK == EVENT_VALUE:",
+        "        packet_type = PACKET_TYPE_EVENT",
+        "    elif outgoing:",
+        "        packet_type = PACKET_TYPE_COMMAND",
+        "    else:",
+        "        packet_type = PACKET_TYPE_RESPONSE",
+        "    return (packet_type << 16) | (header[2] << 8) | header[3]",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def check_tables(codecs, namespace):
+    """Verify every packet resolves through its dispatch slot; return a list of failures."""
+    failures = []
+    for protocol_id in codecs:
+        table = namespace["dispatch_table"](protocol_id)
+        if len(table) != TABLE_SIZE:
+            failures.append("%s: dispatch table has %d slots, expected %d" % (protocol_id, len(table), TABLE_SIZE))
+            continue
+        for codec in codecs[protocol_id]:
+            name = table[dispatch_index(codec["kind"], codec["class_id"], codec["packet_id"])][0]
+            if name != codec["name"]:
+                failures.append("%s: dispatch slot holds '%s'" % (codec["name"], name))
+        unknown = sum(1 for descriptor in table if descriptor is namespace["UNKNOWN_PACKET"])
+        if unknown != TABLE_SIZE - len(codecs[protocol_id]):
+            failures.append("%s: %d unknown slots, expected %d" % (protocol_id, unknown, TABLE_SIZE - len(codecs[protocol_id])))
+    return failures
@@ -0,0 +1,176 @@
+"""EZ-Serial text mode parser backend.
+
+Renders a module that identifies and decodes a text-mode line in one pass:
+the line is split once, its packet is found with a single hash lookup on the
+command/event text name, and a generated per-packet parser decodes the
+fields positionally, falling back to keyed matching if the fields arrive out
+of order or incomplete.
+
+Text mode carries integers as hexadecimal regardless of the "format" hint,
+which only describes how the value is meant to be displayed. Bluetooth
+addresses are printed most significant byte first and are returned in wire
+(little-endian) order so text and binary decoding agree.
+"""
+
+from collections import OrderedDict
+
+from backends.definitions import ARG_KEYS, iter_packet_defs
+from backends.struct_codec import packet_function_name, sample_args
+
+# lookup table receiving each packet kind
+TABLES = OrderedDict([
+    ("command", "COMMANDS"),
+    ("response", "RESPONSES"),
+    ("event", "EVENTS"),
+])
+
+
+def _converter(arg, expression):
+    # Python expression decoding the text value in "expression"
+    if arg["type"] == "int8":
+        return "_int8(%s)" % expression
+    if arg["type"] in ("uint8", "uint16", "uint32"):
+        return "int(%s, 16)" % expression
+    if arg["type"] == "macaddr":
+        return "bytes.fromhex(%s)[::-1]" % expression
+    if arg.get("format") == "string":
+        return "%s.encode(\"utf-8\")" % expression
+    return "bytes.fromhex(%s)" % expression
+
+
+def _render_parser(name, args):
+    fields = ", ".join("\"%s\": (\"%s\", lambda value: %s)" % (arg["textname"], arg["name"], _converter(arg, "value")) for arg in args)
+    lines = [
+        "_%s_fields = {%s}" % (name, fields),
+        "",
+        "def %s_text(tokens):" % name,
+    ]
+    if args:
+        checks = ["len(tokens) == %d" % len(args)]
+        checks += ["tokens[%d][:%d] == \"%s=\"" % (index, len(arg["textname"]) + 1, arg["textname"]) for index, arg in enumerate(args)]
+        items = ["\"%s\": %s" % (arg["name"], _converter(arg, "tokens[%d][%d:]" % (index, len(arg["textname"]) + 1))) for index, arg in enumerate(args)]
+        lines += [
+            "    if %s:" % " and ".join(checks),
+            "        return {%s}" % ", ".join(items),
+        ]
+    lines += [
+        "    return _parse_keyed(tokens, _%s_fields)" % name,
+        "",
+    ]
+    return lines
+
+
+def render_module(protocol, prefix, source_name):
+    """Render the Python source of a text mode parser module."""
+    lines = [
+        "# Generated by perilib-generators from %s definitions; do not edit." % source_name,
+        "",
+        "def _int8(value):",
+        "    value = int(value, 16)",
+        "    return value - 0x100 if value & 0x80 else value",
+        "",
+        "def _parse_keyed(tokens, fields):",
+        "    values = {}",
+        "    for token in tokens:",
+        "        key, _, value = token.partition(\"=\")",
+        "        field = fields.get(key)",
+        "        if field is not None:",
+        "            values[field[0]] = field[1](value)",
+        "    return values",
+        "",
+    ]
+    tables = OrderedDict((kind, []) for kind in TABLES)
+    for kind, class_id, class_name, packet_id, packet_def in iter_packet_defs(protocol):
+        if "textname" not in packet_def:
+            continue
+        name = packet_function_name(prefix, kind, class_name, packet_def["name"])
+        lines += _render_parser(name, packet_def[ARG_KEYS[kind]])
+        tables[kind].append("    \"%s\": (\"%s\", %s_text)," % (packet_def["textname"], name, name))
+
+    lines.append("# text name -> (packet name, field parser)")
+    for kind in TABLES:
+        lines.append("%s = {" % TABLES[kind])
+        lines += tables[kind]
+        lines.append("}")
+        lines.append("")
+
+    lines += [
+        "def parse_line(line):",
+        "    # returns (packet name, values), or None for lines that are not a known packet;",
+        "    # responses (\"@R,<length>,<name>,<result>,...\") also carry a \"result\" value",
+        "    tokens = line.rstrip(\"\\r\\n\").split(\",\")",
+        "    if tokens[0] == \"@E\":",
+        "        entry = EVENTS.get(tokens[2]) if len(tokens) > 2 else None",
+        "        if entry is None:",
+        "            return None",
+        "        return entry[0], entry[1](tokens[3:])",
+        "    if tokens[0] == \"@R\":",
+        "        entry = RESPONSES.get(tokens[2]) if len(tokens) > 3 else None",
+        "        if entry is None:",
+        "            return None",
+        "        values = entry[1](tokens[4:])",
+        "        values[\"result\"] = int(tokens[3], 16)",
+        "        return entry[0], values",
+        "    entry = COMMANDS.get(tokens[0])",
+        "    if entry is None:",
+        "        return None",
+        "    return entry[0], entry[1](tokens[1:])",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _format_value(arg, value):
+    if arg["type"] == "int8":
+        return "%02X" % (value & 0xFF)
+    if arg["type"] in ("uint8", "uint16", "uint32"):
+        return "%X" % value
+    if arg["type"] == "macaddr":
+        return value[::-1].hex().upper()
+    if arg.get("format") == "string":
+        return value.decode("utf-8")
+    return value.hex().upper()
+
+
+def format_line(kind, textname, args, values, result=0):
+    """Format a text mode line for a packet, as the module would send it."""
+    fields = ["%s=%s" % (arg["textname"], _format_value(arg, values[arg["name"]])) for arg in args]
+    if kind == "command":
+        tokens = [textname] + fields
+    else:
+        body = ",".join([textname] + (["%04X" % result] if kind == "response" else []) + fields)
+        tokens = ["@R" if kind == "response" else "@E", "%04X" % len(body), body]
+    return ",".join(tokens) + "\r\n"
+
+
+def check_parser(protocol, prefix, source):
+    """Format and re-parse sample values for every packet; return a list of failures."""
+    namespace = {}
+    exec(compile(source, "<text>", "exec"), namespace)
+    failures = []
+    for kind, class_id, class_name, packet_id, packet_def in iter_packet_defs(protocol):
+        if "textname" not in packet_def:
+            continue
+        name = packet_function_name(prefix, kind, class_name, packet_def["name"])
+        args = packet_def[ARG_KEYS[kind]]
+        for variant in range(3):
+            values = sample_args(args, variant)
+            for arg in args:
+                # text strings must stay printable and free of separators
+                if arg.get("format") == "string":
+                    values[arg["name"]] = b"perilib"[:len(values[arg["name"]])]
+            expected = dict(values)
+            if kind == "response":
+                expected["result"] = 0x1234
+            line = format_line(kind, packet_def["textname"], args, values, 0x1234)
+            parsed = namespace["parse_line"](line)
+            if parsed != (name, expected):
+                failures.append("%s: %r parsed as %r" % (name, line, parsed))
+            # reversed fields take the keyed fallback path
+            if len(args) > 1:
+                tokens = line.rstrip("\r\n").split(",")
+                start = len(tokens) - len(args)
+                reordered = ",".join(tokens[:start] + tokens[start:][::-1])
+                parsed = namespace["parse_line"](reordered)
+                if parsed != (name, expected):
+                    failures.append("%s: %r parsed as %r" % (name, reordered, parsed))
+    return failures
@@ -0,0 +1,97 @@
+"""Static framing metadata for every packet.
+
+Computes the minimum and maximum payload length, the byte offset of every
+argument and the start of any trailing variable-length array, so a runtime
+can reject malformed frames early and slice fields out of a memoryview
+without copying.
+"""
+
+from collections import OrderedDict
+import struct
+
+from backends import datatypes
+from backends.definitions import ARG_KEYS, iter_packet_defs
+
+# definition key holding the layout for each packet kind
+LAYOUT_KEYS = OrderedDict([
+    ("command", "command_layout"),
+    ("response", "response_layout"),
+    ("event", "event_layout"),
+])
+
+
+def packet_framing(args, max_payload):
+    """Compute the framing metadata of an argument list.
+
+    Argument types are wire types; raises ValueError if the layout cannot be
+    determined statically.
+    """
+    layout = datatypes.packet_layout(args)
+    fixed_length = layout["fixed_length"]
+    if fixed_length > max_payload:
+        raise ValueError("fixed fields need %d bytes, more than the %d-byte maximum payload" % (fixed_length, max_payload))
+
+    offsets = [field["offset"] for field in layout["fields"]]
+    min_length = max_length = fixed_length
+    tail_offset = None
+    tail = layout["tail"]
+    if tail is not None:
+        offsets.append(tail["offset"])
+        tail_offset = fixed_length
+        tail_arg = args[-1]
+        prefix_minimum, prefix_maximum = datatypes.integer_range(tail["code"])
+        longest = min(prefix_maximum, tail_arg.get("maxlength", prefix_maximum), max_payload - fixed_length)
+        min_length += tail_arg.get("minlength", 0)
+        max_length += longest
+        if min_length > max_length:
+            raise ValueError("minimum length %d of argument '%s' exceeds its maximum %d" % (
+                tail_arg["minlength"], tail_arg["name"], longest))
+
+    return OrderedDict([
+        ("min_length", min_length),
+        ("max_length", max_length),
+        ("offsets", offsets),
+        ("tail_offset", tail_offset),
+    ])
+
+
+def annotate_protocol(protocol, max_payload):
+    """Store framing metadata in every packet definition; return a list of problems.
+
+    Packets whose layout cannot be determined statically get no layout entry
+    and are reported instead.
+    """
+    problems = []
+    for kind, class_id, class_name, packet_id, packet_def in iter_packet_defs(protocol):
+        try:
+            packet_def[LAYOUT_KEYS[kind]] = packet_framing(packet_def[ARG_KEYS[kind]], max_payload)
+        except ValueError as e:
+            packet_def.pop(LAYOUT_KEYS[kind], None)
+            problems.append("%d/%d %s %s_%s: %s" % (class_id, packet_id, kind, class_name, packet_def["name"], e))
+    return problems
+
+
+def frame_checksum(framing, data):
+    """Compute the footer checksum byte of a frame's header and payload."""
+    return (framing["checksum_initial"] + sum(data)) & 0xFF
+
+
+def build_frame(codec, framing, values):
+    """Build a complete frame for a packet from argument values, with its checksum footer if the framing has one.
+
+    framing is the framing of the packet's protocol, whose type_value (if any)
+    goes into the technology type bits of header byte 0.
+    """
+    layout = codec["layout"]
+    fixed = [values[field["name"]] for field in layout["fields"]]
+    payload = b""
+    if layout["tail"] is not None:
+        tail = values[layout["tail"]["name"]]
+        payload = struct.pack(layout["format"], *(fixed + [len(tail)])) + tail
+    elif fixed:
+        payload = struct.pack(layout["format"], *fixed)
+    first = (framing["event_value"] if codec["kind"] == "event" else framing["command_value"]) | framing.get("type_value", 0)
+    header = bytes([first | (len(payload) >> 8), len(payload) & 0xFF, codec["class_id"], codec["packet_id"]])
+    if framing["footer_length"]:
+        return header + payload + bytes([frame_checksum(framing, header + payload)])
+    return header + payload
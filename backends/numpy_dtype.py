@@ -0,0 +1,121 @@
+"""NumPy structured dtype backend for bulk decoding of captured traffic.
+
+Renders a module with one structured dtype per response and event covering
+the frame header, every fixed-size field and the length of a trailing array,
+so all frames of one packet type in a capture can be decoded with a single
+numpy.frombuffer call. The generated module needs NumPy; this backend does
+not.
+"""
+
+from collections import OrderedDict
+
+from backends import datatypes
+from backends.dispatch import PACKET_TYPES, dispatch_index
+from backends.framing import build_frame
+from backends.struct_codec import sample_args
+
+NUMPY_TYPES = OrderedDict([
+    ("B", "u1"),
+    ("b", "i1"),
+    ("H", "<u2"),
+    ("h", "<i2"),
+    ("I", "<u4"),
+    ("i", "<i4"),
+])
+
+# structured field names used for the frame parts that are not arguments
+HEADER_FIELD = "_header"
+LENGTH_FIELD = "_length"
+
+
+def dtype_fields(codec, framing):
+    """Return the numpy dtype description of a packet's header and fixed fields."""
+    fields = [(HEADER_FIELD, "u1", (framing["header_length"],))]
+    for field in codec["layout"]["fields"]:
+        if datatypes.is_integer(field["code"]):
+            fields.append((field["name"], NUMPY_TYPES[field["code"]]))
+        else:
+            fields.append((field["name"], "u1", (datatypes.type_size(field["code"]),)))
+    tail = codec["layout"]["tail"]
+    if tail is not None:
+        fields.append((LENGTH_FIELD, NUMPY_TYPES[tail["code"]]))
+    return fields
+
+
+def render_module(codecs, framings, source_name):
+    """Render the Python source of a dtype module.
+
+    framings maps each protocol ID to its framing; all of them share one
+    frame layout and differ at most in their type_value.
+    """
+    framing = next(iter(framings.values()))
+    lines = [
+        "# Generated by perilib-generators from %s definitions; do not edit." % source_name,
+        "",
+        "import numpy",
+        "",
+        "# frame layout",
+        "HEADER_LENGTH = %d" % framing["header_length"],
+        "FOOTER_LENGTH = %d" % framing["footer_length"],
+        "LENGTH_HIGH_MASK = 0x%02X" % framing["length_high_mask"],
+        "EVENT_MASK = 0x%02X" % framing["event_mask"],
+        "EVENT_VALUE = 0x%02X" % framing["event_value"],
+        "COMMAND_VALUE = 0x%02X" % framing["command_value"],
+        "",
+        "# technology type bits of header byte 0: (header[0] & TYPE_MASK) == TYPE_VALUES[protocol_id]",
+        "TYPE_MASK = 0x%02X" % framing.get("type_mask", 0),
+        "TYPE_VALUES = {%s}" % ", ".join("\"%s\": 0x%02X" % (protocol_id, framings[protocol_id].get("type_value", 0)) for protocol_id in codecs),
+        "",
+        "# packet type component of the dispatch index",
+        "PACKET_TYPE_RESPONSE = %d" % PACKET_TYPES["response"],
+        "PACKET_TYPE_EVENT = %d" % PACKET_TYPES["event"],
+        "",
+        "HEADER_FIELD = \"%s\"" % HEADER_FIELD,
+        "LENGTH_FIELD = \"%s\"" % LENGTH_FIELD,
+        "",
+        "# dispatch index -> (name, dtype of header and fixed fields, trailing array name or None)",
+        "PACKETS = {",
+    ]
+    for protocol_id in codecs:
+        lines.append("    \"%s\": {" % protocol_id)
+        for codec in codecs[protocol_id]:
+            if codec["kind"] == "command":
+                continue
+            tail = codec["layout"]["tail"]
+            lines.append("        0x%05X: (\"%s\", numpy.dtype(%r), %s)," % (
+                dispatch_index(codec["kind"], codec["class_id"], codec["packet_id"]), codec["name"],
+                dtype_fields(codec, framings[protocol_id]), "\"%s\"" % tail["name"] if tail is not None else "None"))
+        lines.append("    },")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def check_dtypes(codecs, framings, source):
+    """Decode one sample frame per packet through its dtype; return (ran, failures)."""
+    try:
+        import numpy
+    except ImportError:
+        return False, []
+
+    namespace = {}
+    exec(compile(source, "<dtypes>", "exec"), namespace)
+    failures = []
+    for protocol_id in codecs:
+        framing = framings[protocol_id]
+        for codec in codecs[protocol_id]:
+            if codec["kind"] == "command":
+                continue
+            name, dtype, tail = namespace["PACKETS"][protocol_id][dispatch_index(codec["kind"], codec["class_id"], codec["packet_id"])]
+            values = sample_args(codec["args"], 1)
+            frame = build_frame(codec, framing, values)
+            record = numpy.frombuffer(frame[:dtype.itemsize], dtype=dtype)[0]
+            for field in codec["layout"]["fields"]:
+                decoded = record[field["name"]]
+                decoded = bytes(decoded) if not datatypes.is_integer(field["code"]) else int(decoded)
+                if decoded != values[field["name"]]:
+                    failures.append("%s.%s: decoded %r, expected %r" % (name, field["name"], decoded, values[field["name"]]))
+            if tail is not None and int(record[LENGTH_FIELD]) != len(values[tail]):
+                failures.append("%s: decoded %s length %d, expected %d" % (name, tail, int(record[LENGTH_FIELD]), len(values[tail])))
+            if dtype.itemsize != framing["header_length"] + codec["layout"]["fixed_length"]:
+                failures.append("%s: dtype covers %d bytes, expected %d" % (name, dtype.itemsize, framing["header_length"] + codec["layout"]["fixed_length"]))
+    return True, failures
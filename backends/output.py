@@ -0,0 +1,101 @@
+"""Output writing and check reporting shared by the generators."""
+
+import os
+
+from backends import binary, c_tables, cache, dispatch, numpy_dtype, struct_codec, validation
+
+
+def emit(filename, data):
+    """Write an output only if it changed and report it; return True if written."""
+    written = cache.write_if_changed(filename, data)
+    print("%s: %s" % (filename, "written" if written else "unchanged"))
+    return written
+
+
+def report(name, failures, detail=None, skipped=None):
+    """Print a check's failures and summary line; return the failures.
+
+    skipped gives the reason a check could not run, in which case it reports
+    no failures.
+    """
+    if skipped is not None:
+        print("%s: skipped, %s" % (name, skipped))
+        return []
+    for failure in failures:
+        print("FAILED: %s" % failure)
+    print("%s: %s%d failures" % (name, detail + ", " if detail else "", len(failures)))
+    return list(failures)
+
+
+def report_problems(label, name, problems):
+    """Print definition problems as "<label>: ..." lines and a summary; return them."""
+    for problem in problems:
+        print("%s: %s" % (label, problem))
+    print("%s check: %d problems" % (name, len(problems)))
+    return list(problems)
+
+
+def write_codecs(args, codecs, framing, name):
+    """Write the struct codec module if requested and, with --check, round-trip it; return the failures."""
+    source = struct_codec.render_module(codecs, name) + dispatch.render_tables(codecs, framing)
+    if args.codecs is not None:
+        emit(args.codecs, source)
+    if not args.check:
+        return []
+    namespace = struct_codec.load_module(source)
+    return report("codec check", struct_codec.check_round_trip(codecs, namespace) + dispatch.check_tables(codecs, namespace),
+        "%d packets" % sum(len(codecs[protocol_id]) for protocol_id in codecs))
+
+
+def write_c_tables(args, codecs, protocols, framings, name):
+    """Write the C tables, parser and harness if requested and, with --check, run the harness; return the failures.
+
+    framings maps each protocol ID to its framing.
+    """
+    if args.c_tables is None:
+        return []
+    os.makedirs(args.c_tables, exist_ok=True)
+    prefixes = dict((protocol_id, prefix) for prefix, protocol_id, protocol in protocols)
+    for filename, text in c_tables.render(codecs, prefixes, framings, name).items():
+        emit(os.path.join(args.c_tables, filename), text)
+    if not args.check:
+        return []
+    ran, failures = c_tables.check_harness(args.c_tables, name)
+    return report("C harness", failures, skipped=None if ran else "no C compiler found")
+
+
+def write_numpy(args, codecs, framings, name):
+    """Write the NumPy dtype module if requested and, with --check, decode sample frames; return the failures.
+
+    framings maps each protocol ID to its framing.
+    """
+    if args.numpy is None:
+        return []
+    source = numpy_dtype.render_module(codecs, framings, name)
+    emit(args.numpy, source)
+    if not args.check:
+        return []
+    ran, failures = numpy_dtype.check_dtypes(codecs, framings, source)
+    return report("dtype check", failures, skipped=None if ran else "numpy not installed")
+
+
+def write_binary(args, json_definition):
+    """Write the binary definitions if requested and, with --check, decode them back; return the failures."""
+    if args.binary is None:
+        return []
+    emit(args.binary, binary.encode_definitions(json_definition))
+    if not args.check:
+        return []
+    return report("binary check", binary.check_definitions(json_definition, args.binary),
+        "%d protocols" % len(json_definition["protocols"]))
+
+
+def write_validators(args, protocols, name):
+    """Write the command validator module if requested and, with --check, probe its rules; return the failures."""
+    if args.validators is None:
+        return []
+    source = validation.render_module(protocols, name)
+    emit(args.validators, source)
+    if not args.check:
+        return []
+    return report("validator check", validation.check_validators(protocols, source))
@@ -0,0 +1,174 @@
+"""Precompiled struct codec backend.
+
+Turns every packet's argument list into a prebuilt struct.Struct covering the
+fixed-size prefix (plus the length of a trailing variable-length array, if
+any) and renders a Python module with one pack/unpack function per packet.
+"""
+
+from collections import OrderedDict
+
+from backends import datatypes
+from backends.definitions import ARG_KEYS, iter_packet_defs
+from backends.framing import LAYOUT_KEYS
+
+# function name infix for each packet kind, matching the generator output
+KIND_ABBREVIATIONS = OrderedDict([
+    ("command", "cmd"),
+    ("response", "rsp"),
+    ("event", "evt"),
+])
+
+
+def packet_function_name(prefix, kind, class_name, packet_name):
+    return "%s_%s_%s_%s" % (prefix, KIND_ABBREVIATIONS[kind], class_name, packet_name)
+
+
+def build_codecs(protocols):
+    """Compute codec descriptors for a list of (prefix, protocol ID, protocol) tuples.
+
+    Packets without a layout entry (see framing.annotate_protocol()) have no
+    static layout; they are left out and only reported as layout problems.
+    """
+    codecs = OrderedDict()
+    names = set()
+    for prefix, protocol_id, protocol in protocols:
+        codecs[protocol_id] = []
+        for kind, class_id, class_name, packet_id, packet_def in iter_packet_defs(protocol):
+            if LAYOUT_KEYS[kind] not in packet_def:
+                continue
+            args = packet_def[ARG_KEYS[kind]]
+            name = packet_function_name(prefix, kind, class_name, packet_def["name"])
+            if name in names:
+                raise ValueError("duplicate packet function name '%s'" % name)
+            names.add(name)
+            codecs[protocol_id].append(OrderedDict([
+                ("name", name),
+                ("kind", kind),
+                ("class_id", class_id),
+                ("packet_id", packet_id),
+                ("args", args),
+                ("layout", datatypes.packet_layout(args)),
+            ]))
+    return codecs
+
+
+def _render_pack(codec):
+    layout = codec["layout"]
+    params = [field["name"] for field in layout["fields"]]
+    if layout["tail"] is None:
+        if not params:
+            return "def %s_pack():\n    return b\"\"\n" % codec["name"]
+        return "def %s_pack(%s):\n    return _%s.pack(%s)\n" % (
+            codec["name"], ", ".join(params), codec["name"], ", ".join(params))
+
+    tail = layout["tail"]["name"]
+    return "def %s_pack(%s):\n    return _%s.pack(%s) + %s\n" % (
+        codec["name"], ", ".join(params + [tail]), codec["name"],
+        ", ".join(params + ["len(%s)" % tail]), tail)
+
+
+def _render_unpack(codec):
+    layout = codec["layout"]
+    items = ["\"%s\": values[%d]" % (field["name"], index) for index, field in enumerate(layout["fields"])]
+    if layout["tail"] is None:
+        if not items:
+            return "def %s_unpack(payload):\n    return {}\n" % codec["name"]
+        return "def %s_unpack(payload):\n    values = _%s.unpack_from(payload)\n    return {%s}\n" % (
+            codec["name"], codec["name"], ", ".join(items))
+
+    # the array length is the last value in the fixed prefix
+    length_index = len(layout["fields"])
+    start = layout["fixed_length"]
+    items.append("\"%s\": tail" % layout["tail"]["name"])
+    return (
+        "def %s_unpack(payload):\n"
+        "    values = _%s.unpack_from(payload)\n"
+        "    tail = bytes(payload[%d:%d + values[%d]])\n"
+        "    if len(tail) != values[%d]:\n"
+        "        raise struct.error(\"truncated '%s' payload\")\n"
+        "    return {%s}\n"
+    ) % (codec["name"], codec["name"], start, start, length_index, length_index,
+         layout["tail"]["name"], ", ".join(items))
+
+
+def render_module(codecs, source_name):
+    """Render the Python source of a codec module."""
+    lines = [
+        "# Generated by perilib-generators from %s definitions; do not edit." % source_name,
+        "",
+        "import struct",
+        "",
+    ]
+
+    for protocol_id in codecs:
+        lines.append("")
+        lines.append("# %s" % protocol_id)
+        for codec in codecs[protocol_id]:
+            lines.append("")
+            if codec["layout"]["fields"] or codec["layout"]["tail"] is not None:
+                lines.append("_%s = struct.Struct(\"%s\")" % (codec["name"], codec["layout"]["format"]))
+                lines.append("")
+            lines.append(_render_pack(codec))
+            lines.append(_render_unpack(codec))
+
+    # lookup from (kind, class ID, packet ID) to the (pack, unpack) pair
+    lines.append("")
+    lines.append("CODECS = {")
+    for protocol_id in codecs:
+        lines.append("    \"%s\": {" % protocol_id)
+        for codec in codecs[protocol_id]:
+            lines.append("        (\"%s\", %d, %d): (%s_pack, %s_unpack)," % (
+                codec["kind"], codec["class_id"], codec["packet_id"], codec["name"], codec["name"]))
+        lines.append("    },")
+    lines.append("}")
+
+    return "\n".join(lines) + "\n"
+
+
+def sample_args(args, variant=0):
+    """Build deterministic argument values covering each datatype's range."""
+    values = OrderedDict()
+    for index, arg in enumerate(args):
+        seed = index + variant
+        if arg["type"] in datatypes.FIXED_TYPES:
+            code = datatypes.FIXED_TYPES[arg["type"]]
+            if datatypes.is_integer(code):
+                minimum, maximum = datatypes.integer_range(code)
+                values[arg["name"]] = (minimum, maximum, (minimum + maximum) // 2)[seed % 3]
+            else:
+                values[arg["name"]] = bytes((seed * 31 + i) & 0xFF for i in range(datatypes.type_size(code)))
+        else:
+            # alternate empty and populated arrays
+            length = 0 if variant % 2 == 0 else (seed * 7) % 32 + 1
+            values[arg["name"]] = bytes((seed * 13 + i) & 0xFF for i in range(length))
+    return values
+
+
+def load_module(source):
+    """Execute rendered module source and return its namespace."""
+    namespace = {}
+    exec(compile(source, "<codecs>", "exec"), namespace)
+    return namespace
+
+
+def check_round_trip(codecs, namespace):
+    """Pack and unpack sample values for every packet; return a list of failures."""
+    failures = []
+    for protocol_id in codecs:
+        for codec in codecs[protocol_id]:
+            pack, unpack = namespace["CODECS"][protocol_id][(codec["kind"], codec["class_id"], codec["packet_id"])]
+            for variant in range(3):
+                values = sample_args(codec["args"], variant)
+                try:
+                    payload = pack(*values.values())
+                    tail = codec["layout"]["tail"]
+                    expected_length = codec["layout"]["fixed_length"] + (len(values[tail["name"]]) if tail else 0)
+                    if len(payload) != expected_length:
+                        failures.append("%s: packed %d bytes, expected %d" % (codec["name"], len(payload), expected_length))
+                    elif unpack(payload) != dict(values):
+                        failures.append("%s: unpacked values differ (variant %d)" % (codec["name"], variant))
+                    elif unpack(memoryview(payload)) != dict(values):
+                        failures.append("%s: unpacked memoryview values differ (variant %d)" % (codec["name"], variant))
+                except Exception as e:
+                    failures.append("%s: %s" % (codec["name"], e))
+    return failures
@@ -0,0 +1,245 @@
+"""Argument validation tables and specialized validators.
+
+Compiles every packet's arguments into a table of rules (integer bounds, valid
+enum sets or flag masks, fixed field lengths and array length caps) that a
+runtime can check before packing, and renders a Python module with one
+validator per command whose fast path is a single chained comparison.
+"""
+
+from collections import OrderedDict
+
+from backends import datatypes
+from backends.definitions import ARG_KEYS, iter_packet_defs
+from backends.struct_codec import packet_function_name
+
+# definition key holding the validation rules for each packet kind
+VALIDATION_KEYS = OrderedDict([
+    ("command", "command_validation"),
+    ("response", "response_validation"),
+    ("event", "event_validation"),
+])
+
+
+def enum_rule(values, flags=False):
+    """Turn the values of an enum block into a rule entry.
+
+    Flag blocks, whose values may be combined, become a mask of all their
+    bits; other blocks become the set of valid values.
+    """
+    if flags:
+        mask = 0
+        for value in values:
+            mask |= value
+        return OrderedDict([("mask", mask)])
+    return OrderedDict([("values", sorted(set(values)))])
+
+
+def packet_rules(args, max_payload, enums=None):
+    """Compute the validation rules of an argument list.
+
+    enums maps argument names to their enum_rule() entry, if any.
+    Raises ValueError if an argument's type is unknown.
+    """
+    layout = datatypes.packet_layout(args)
+    declared = dict((arg["name"], arg) for arg in args)
+    rules = []
+    for field in layout["fields"]:
+        arg = declared[field["name"]]
+        rule = OrderedDict([("name", field["name"])])
+        if datatypes.is_integer(field["code"]):
+            minimum, maximum = datatypes.integer_range(field["code"])
+            rule["minimum"] = max(minimum, arg.get("minimum", minimum))
+            rule["maximum"] = min(maximum, arg.get("maximum", maximum))
+            if rule["minimum"] > rule["maximum"]:
+                raise ValueError("argument '%s' has an empty range %d..%d" % (field["name"], rule["minimum"], rule["maximum"]))
+            if enums and field["name"] in enums:
+                rule.update(enums[field["name"]])
+        else:
+            rule["length"] = datatypes.type_size(field["code"])
+        rules.append(rule)
+
+    tail = layout["tail"]
+    if tail is not None:
+        arg = declared[tail["name"]]
+        prefix_maximum = datatypes.integer_range(tail["code"])[1]
+        rule = OrderedDict([("name", tail["name"])])
+        rule["minlength"] = arg.get("minlength", 0)
+        rule["maxlength"] = min(prefix_maximum, arg.get("maxlength", prefix_maximum), max_payload - layout["fixed_length"])
+        rules.append(rule)
+    return rules
+
+
+def annotate_protocol(protocol, max_payload, enum_sets=None):
+    """Store validation rules in every packet definition; return a list of problems.
+
+    enum_sets maps (kind, class name, packet name) to the enums argument of
+    packet_rules().
+    """
+    problems = []
+    for kind, class_id, class_name, packet_id, packet_def in iter_packet_defs(protocol):
+        enums = (enum_sets or {}).get((kind, class_name, packet_def["name"]))
+        try:
+            packet_def[VALIDATION_KEYS[kind]] = packet_rules(packet_def[ARG_KEYS[kind]], max_payload, enums)
+        except ValueError as e:
+            packet_def.pop(VALIDATION_KEYS[kind], None)
+            problems.append("%d/%d %s %s_%s: %s" % (class_id, packet_id, kind, class_name, packet_def["name"], e))
+    return problems
+
+
+def _conditions(rule):
+    name = rule["name"]
+    if "length" in rule:
+        return ["len(%s) == %d" % (name, rule["length"])]
+    if "maxlength" in rule:
+        if rule["minlength"]:
+            return ["%d <= len(%s) <= %d" % (rule["minlength"], name, rule["maxlength"])]
+        return ["len(%s) <= %d" % (name, rule["maxlength"])]
+    conditions = ["%d <= %s <= %d" % (rule["minimum"], name, rule["maximum"])]
+    if "values" in rule:
+        conditions.append("%s in {%s}" % (name, ", ".join(str(value) for value in rule["values"])))
+    if "mask" in rule:
+        conditions.append("not %s & ~0x%X" % (name, rule["mask"]))
+    return conditions
+
+
+def _render_validator(name, rules):
+    params = ", ".join(rule["name"] for rule in rules)
+    conditions = [condition for rule in rules for condition in _conditions(rule)]
+    lines = [
+        "_%s_rules = %r" % (name, tuple(tuple(rule.items()) for rule in rules)),
+        "",
+        "def %s_validate(%s):" % (name, params),
+    ]
+    if conditions:
+        lines += [
+            "    if %s:" % " and ".join(conditions),
+            "        return None",
+            "    return _explain(_%s_rules, (%s%s))" % (name, params, "," if len(rules) == 1 else ""),
+        ]
+    else:
+        lines.append("    return None")
+    lines.append("")
+    return lines
+
+
+def render_module(protocols, source_name):
+    """Render the Python source of a command validator module.
+
+    protocols is a list of (prefix, protocol ID, protocol) tuples, as passed to
+    struct_codec.build_codecs().
+    """
+    lines = [
+        "# Generated by perilib-generators from %s definitions; do not edit." % source_name,
+        "",
+        "def _explain(rules, values):",
+        "    # slow path: name the first argument that breaks its rule",
+        "    for rule, value in zip(rules, values):",
+        "        rule = dict(rule)",
+        "        if \"length\" in rule or \"maxlength\" in rule:",
+        "            if \"length\" in rule and len(value) != rule[\"length\"]:",
+        "                return \"%s must be %d bytes, got %d\" % (rule[\"name\"], rule[\"length\"], len(value))",
+        "            if \"maxlength\" in rule and not rule[\"minlength\"] <= len(value) <= rule[\"maxlength\"]:",
+        "                return \"%s must be %d to %d bytes, got %d\" % (rule[\"name\"], rule[\"minlength\"], rule[\"maxlength\"], len(value))",
+        "        elif not rule[\"minimum\"] <= value <= rule[\"maximum\"]:",
+        "            return \"%s must be in %d..%d, got %d\" % (rule[\"name\"], rule[\"minimum\"], rule[\"maximum\"], value)",
+        "        elif \"values\" in rule and value not in rule[\"values\"]:",
+        "            return \"%s must be one of %s, got %d\" % (rule[\"name\"], \", \".join(str(valid) for valid in rule[\"values\"]), value)",
+        "        elif \"mask\" in rule and value & ~rule[\"mask\"]:",
+        "            return \"%s has flags outside 0x%X, got 0x%X\" % (rule[\"name\"], rule[\"mask\"], value)",
+        "    return None",
+        "",
+    ]
+    entries = OrderedDict()
+    for prefix, protocol_id, protocol in protocols:
+        entries[protocol_id] = []
+        for kind, class_id, class_name, packet_id, packet_def in iter_packet_defs(protocol):
+            if kind != "command" or VALIDATION_KEYS[kind] not in packet_def:
+                continue
+            name = packet_function_name(prefix, kind, class_name, packet_def["name"])
+            lines += _render_validator(name, packet_def[VALIDATION_KEYS[kind]])
+            entries[protocol_id].append(name)
+
+    lines.append("# protocol ID -> command name -> validator")
+    lines.append("VALIDATORS = {")
+    for protocol_id in entries:
+        lines.append("    \"%s\": {" % protocol_id)
+        lines += ["        \"%s\": %s_validate," % (name, name) for name in entries[protocol_id]]
+        lines.append("    },")
+    lines += [
+        "}",
+        "",
+        "def validate_batch(protocol_id, batch, trusted=False):",
+        "    # batch holds (command name, argument tuple) pairs; returns (index, message)",
+        "    # for every invalid command, or nothing at all in trusted mode",
+        "    if trusted:",
+        "        return []",
+        "    validators = VALIDATORS[protocol_id]",
+        "    errors = []",
+        "    for index, (name, values) in enumerate(batch):",
+        "        message = validators[name](*values)",
+        "        if message is not None:",
+        "            errors.append((index, message))",
+        "    return errors",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _invalid_value(rule):
+    # a value that passes the type check but breaks the rule, or None
+    if "length" in rule:
+        return None
+    if "maxlength" in rule:
+        return bytes(rule["maxlength"] + 1)
+    if "values" in rule:
+        return next((value for value in range(rule["minimum"], rule["maximum"] + 1) if value not in rule["values"]), None)
+    if "mask" in rule:
+        return next((1 << bit for bit in range(32) if not rule["mask"] & (1 << bit) and 1 << bit <= rule["maximum"]), None)
+    return rule["maximum"] + 1
+
+
+def _valid_value(rule, variant):
+    if "length" in rule:
+        return bytes(rule["length"])
+    if "maxlength" in rule:
+        return bytes((rule["minlength"], rule["maxlength"])[variant % 2])
+    if "values" in rule:
+        return rule["values"][variant % len(rule["values"])]
+    if "mask" in rule:
+        return (0, rule["mask"])[variant % 2] if rule["mask"] <= rule["maximum"] else 0
+    return (rule["minimum"], rule["maximum"])[variant % 2]
+
+
+def check_validators(protocols, source):
+    """Check boundary values pass and out-of-rule values fail; return a list of failures."""
+    namespace = {}
+    exec(compile(source, "<validators>", "exec"), namespace)
+    failures = []
+    for prefix, protocol_id, protocol in protocols:
+        validators = namespace["VALIDATORS"][protocol_id]
+        batch = []
+        for kind, class_id, class_name, packet_id, packet_def in iter_packet_defs(protocol):
+            if kind != "command" or VALIDATION_KEYS[kind] not in packet_def:
+                continue
+            name = packet_function_name(prefix, kind, class_name, packet_def["name"])
+            rules = packet_def[VALIDATION_KEYS[kind]]
+            for variant in range(2):
+                values = tuple(_valid_value(rule, variant) for rule in rules)
+                message = validators[name](*values)
+                if message is not None:
+                    failures.append("%s: valid arguments %r rejected: %s" % (name, values, message))
+                batch.append((name, values))
+            for index, rule in enumerate(rules):
+                invalid = _invalid_value(rule)
+                if invalid is None:
+                    continue
+                values = tuple(invalid if position == index else _valid_value(other, 0) for position, other in enumerate(rules))
+                if validators[name](*values) is None:
+                    failures.append("%s: invalid %s=%r accepted" % (name, rule["name"], invalid))
+                batch.append((name, values))
+
+        invalid_count = len(batch) - sum(1 for name, values in batch if validators[name](*values) is None)
+        if len(namespace["validate_batch"](protocol_id, batch)) != invalid_count:
+            failures.append("%s: batch validation disagrees with per-command validation" % protocol_id)
+        if namespace["validate_batch"](protocol_id, batch, trusted=True):
+            failures.append("%s: trusted batch validation reported errors" % protocol_id)
+    return failures
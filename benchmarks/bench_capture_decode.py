@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+# Benchmark bulk capture decoding (tools/decode_capture.py) on a synthetic
+# trace of received frames, optionally against decoding the same frames one
+# at a time with the generated struct codecs.
+
+import argparse
+import importlib.util
+import json
+import mmap
+import os
+import sys
+import tempfile
+import time
+
+import numpy
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(REPO_DIR, "tools"))
+import decode_capture
+
+
+def load_module(name, filename):
+    spec = importlib.util.spec_from_file_location(name, filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthesize_trace(filename, dtypes, protocol_id, frame_count, packet_types, seed):
+    """Write frame_count random frames drawn from a skewed mix of packet types."""
+    rng = numpy.random.default_rng(seed)
+    packets = dtypes.PACKETS[protocol_id]
+
+    # a few hot packet types dominate real traces, so weight them by 1/rank
+    keys = sorted(packets)
+    rng.shuffle(keys)
+    keys = keys[:packet_types]
+    weights = 1.0 / numpy.arange(1, len(keys) + 1)
+    choices = rng.choice(len(keys), size=frame_count, p=weights / weights.sum())
+
+    # frame sizes in trace order, with random trailing array lengths
+    tail_lengths = numpy.zeros(frame_count, dtype=numpy.int64)
+    fixed_sizes = numpy.array([packets[key][1].itemsize for key in keys], dtype=numpy.int64)[choices]
+    has_tail = numpy.array([packets[key][2] is not None for key in keys])[choices]
+    tail_lengths[has_tail] = rng.integers(0, 32, size=int(has_tail.sum()))
+    sizes = fixed_sizes + tail_lengths + dtypes.FOOTER_LENGTH
+    offsets = numpy.concatenate(([0], numpy.cumsum(sizes)[:-1]))
+
+    # random bytes everywhere, then write every frame's header and fixed part
+    trace = rng.integers(0, 256, size=int(sizes.sum()), dtype=numpy.uint8)
+    for choice, key in enumerate(keys):
+        name, dtype, tail = packets[key]
+        members = numpy.nonzero(choices == choice)[0]
+        records = numpy.frombuffer(rng.integers(0, 256, size=len(members) * dtype.itemsize, dtype=numpy.uint8).tobytes(), dtype=dtype).copy()
+        payload_lengths = dtype.itemsize - dtypes.HEADER_LENGTH + tail_lengths[members]
+        first = (dtypes.EVENT_VALUE if key >> 16 == dtypes.PACKET_TYPE_EVENT else dtypes.COMMAND_VALUE) | dtypes.TYPE_VALUES[protocol_id]
+        records[dtypes.HEADER_FIELD][:, 0] = first | (payload_lengths >> 8)
+        records[dtypes.HEADER_FIELD][:, 1] = payload_lengths & 0xFF
+        records[dtypes.HEADER_FIELD][:, 2] = (key >> 8) & 0xFF
+        records[dtypes.HEADER_FIELD][:, 3] = key & 0xFF
+        if tail is not None:
+            records[dtypes.LENGTH_FIELD] = tail_lengths[members]
+        windows = numpy.lib.stride_tricks.as_strided(trace, shape=(len(trace) - dtype.itemsize + 1, dtype.itemsize), strides=(1, 1), writeable=True)
+        windows[offsets[members]] = records.view(numpy.uint8).reshape(len(members), dtype.itemsize)
+
+    trace.tofile(filename)
+    return len(trace)
+
+
+def per_packet_decode(buffer, codecs, protocol_id, dtypes, limit):
+    # the baseline: frame, dispatch and struct-decode every frame in Python
+    table = codecs.dispatch_table(protocol_id)
+    dispatch_index = codecs.dispatch_index
+    view = memoryview(buffer)
+    header_length = dtypes.HEADER_LENGTH
+    footer_length = dtypes.FOOTER_LENGTH
+    length_high_mask = dtypes.LENGTH_HIGH_MASK
+    position = count = 0
+    while count < limit and position + header_length <= len(view):
+        header = view[position:position + header_length]
+        payload_length = ((header[0] & length_high_mask) << 8) | header[1]
+        unpack = table[dispatch_index(header)][2]
+        if unpack is not None:
+            unpack(view[position + header_length:position + header_length + payload_length])
+        position += header_length + payload_length + footer_length
+        count += 1
+    del header
+    view.release()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bulk capture decoding on a synthetic trace")
+    parser.add_argument("dtypes", help="dtype module written by build_perilib_json.py --numpy")
+    parser.add_argument("protocol_id", help="protocol to synthesize, e.g. silabs-bgapi-bgm1xx")
+    parser.add_argument("--frames", type=int, default=2000000, help="frames in the synthetic trace (default: 2000000)")
+    parser.add_argument("--packet-types", type=int, default=32, help="distinct packet types in the mix (default: 32)")
+    parser.add_argument("--codecs", help="codec module written by --codecs, to compare against per-packet decoding")
+    parser.add_argument("--baseline-frames", type=int, default=200000, help="frames decoded one at a time for the comparison (default: 200000)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write results as JSON to this file")
+    args = parser.parse_args()
+
+    dtypes = decode_capture.load_dtype_module(args.dtypes)
+    packets = dtypes.PACKETS[args.protocol_id]
+    results = {"protocol_id": args.protocol_id, "frames": args.frames}
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "trace.bin")
+        start = time.perf_counter()
+        results["trace_bytes"] = synthesize_trace(filename, dtypes, args.protocol_id, args.frames, args.packet_types, args.seed)
+        print("synthesized %d frames (%.1f MB) in %.2f s" % (args.frames, results["trace_bytes"] / 1e6, time.perf_counter() - start))
+
+        with open(filename, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        start = time.perf_counter()
+        frame_index = decode_capture.index_frames(buffer, dtypes)
+        indexed = time.perf_counter()
+        groups, unknown, malformed = decode_capture.decode_groups(buffer, frame_index, packets, dtypes)
+        decoded = time.perf_counter()
+        if len(frame_index[0]) != args.frames or unknown or malformed:
+            raise SystemExit("trace decoded inconsistently: %d frames, %d unknown, %d malformed" % (len(frame_index[0]), unknown, malformed))
+
+        results["index_seconds"] = indexed - start
+        results["decode_seconds"] = decoded - indexed
+        results["bulk_frames_per_second"] = args.frames / (decoded - start)
+        print("bulk: indexed in %.2f s, decoded %d groups in %.2f s, %.0f frames/s" % (
+            results["index_seconds"], len(groups), results["decode_seconds"], results["bulk_frames_per_second"]))
+
+        if args.codecs:
+            codecs = load_module("perilib_codecs", args.codecs)
+            start = time.perf_counter()
+            count = per_packet_decode(buffer, codecs, args.protocol_id, dtypes, args.baseline_frames)
+            elapsed = time.perf_counter() - start
+            results["per_packet_frames_per_second"] = count / elapsed
+            print("per-packet: %d frames in %.2f s, %.0f frames/s (bulk decode is %.1fx faster)" % (
+                count, elapsed, results["per_packet_frames_per_second"],
+                results["bulk_frames_per_second"] / results["per_packet_frames_per_second"]))
+
+        del frame_index, groups
+        buffer.close()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
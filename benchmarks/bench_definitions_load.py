@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+# Compare cold-start time and resident memory of loading one protocol from the
+# JSON definitions against the binary definitions. Every sample runs in a fresh
+# interpreter so nothing is shared between runs.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# each loader times its own imports as well, since they are part of the cold start
+LOADERS = {
+    "baseline": """
+import time
+start = time.perf_counter()
+elapsed = time.perf_counter() - start
+""",
+    "json": """
+import time
+start = time.perf_counter()
+import json
+from collections import OrderedDict
+with open(FILENAME, "r") as f:
+    protocol = json.load(f, object_pairs_hook=OrderedDict)["protocols"][PROTOCOL_ID]
+for group in protocol["packets"].values():
+    for class_id in group["entities"]:
+        group["entities"][class_id]
+elapsed = time.perf_counter() - start
+""",
+    "binary": """
+import sys, time
+sys.path.insert(0, REPO_DIR)
+start = time.perf_counter()
+from backends.binary import BinaryDefinitions
+protocol = BinaryDefinitions(FILENAME).protocol(PROTOCOL_ID)
+for group in protocol["packets"].values():
+    for class_id in group["entities"]:
+        group["entities"][class_id]
+elapsed = time.perf_counter() - start
+""",
+    "binary-one-class": """
+import sys, time
+sys.path.insert(0, REPO_DIR)
+start = time.perf_counter()
+from backends.binary import BinaryDefinitions
+protocol = BinaryDefinitions(FILENAME).protocol(PROTOCOL_ID)
+entities = protocol["packets"]["events"]["entities"]
+entities[next(iter(entities))]
+elapsed = time.perf_counter() - start
+""",
+}
+
+# prints "<seconds> <peak RSS in KiB>"; ru_maxrss is inherited from the parent
+# across exec on Linux, so prefer the process's own high-water mark
+REPORT = """
+try:
+    with open("/proc/self/status") as f:
+        rss = int([line for line in f if line.startswith("VmHWM:")][0].split()[1])
+except (OSError, IndexError):
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print("%f %d" % (elapsed, rss))
+"""
+
+
+def run_loader(mode, filename, protocol_id):
+    code = "FILENAME = %r\nPROTOCOL_ID = %r\nREPO_DIR = %r\n%s%s" % (filename, protocol_id, REPO_DIR, LOADERS[mode], REPORT)
+    output = subprocess.check_output([sys.executable, "-c", code])
+    elapsed, rss = output.split()
+    return float(elapsed), int(rss)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON against binary definition loading")
+    parser.add_argument("json_file", help="JSON definitions, e.g. ../../perilib-definitions/silabs_bgapi.json")
+    parser.add_argument("binary_file", help="binary definitions, e.g. ../../perilib-definitions/silabs_bgapi.bin")
+    parser.add_argument("protocol_id", help="protocol to load, e.g. silabs-bgapi-bgm1xx")
+    parser.add_argument("--runs", type=int, default=20, help="fresh interpreters per mode (default: 20)")
+    parser.add_argument("--output", help="also write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in LOADERS:
+        filename = args.binary_file if mode.startswith("binary") else args.json_file
+        samples = [run_loader(mode, filename, args.protocol_id) for _ in range(args.runs)]
+        results[mode] = {
+            "load_ms_median": statistics.median(elapsed for elapsed, _ in samples) * 1000,
+            "load_ms_min": min(elapsed for elapsed, _ in samples) * 1000,
+            "max_rss_kib_median": statistics.median(rss for _, rss in samples),
+        }
+
+    baseline_rss = results["baseline"]["max_rss_kib_median"]
+    print("%-18s %12s %12s %14s" % ("mode", "median ms", "min ms", "RSS +KiB"))
+    for mode in LOADERS:
+        result = results[mode]
+        result["rss_over_baseline_kib"] = result["max_rss_kib_median"] - baseline_rss
+        print("%-18s %12.2f %12.2f %14d" % (mode, result["load_ms_median"], result["load_ms_min"], result["rss_over_baseline_kib"]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"protocol_id": args.protocol_id, "runs": args.runs, "results": results}, f, indent=4)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
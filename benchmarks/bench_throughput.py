@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+# Measure decode and encode throughput, per-packet latency and allocations of
+# the generated struct codecs for every protocol in the generated definitions,
+# on synthetic traffic whose payloads respect each argument's type and the
+# EZ-Serial minimum/maximum bounds. Results are written as JSON so runs can be
+# compared with --compare.
+
+from collections import OrderedDict
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO_DIR)
+from backends import datatypes, dedup, dispatch, framing, struct_codec
+
+# generators whose definitions are benchmarked, for their framing and protocol IDs
+GENERATORS = [
+    os.path.join(REPO_DIR, "silabs_bgapi", "build_perilib_json.py"),
+    os.path.join(REPO_DIR, "cypress_ezserial", "build_perilib_json.py"),
+]
+
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+def load_generator(filename):
+    name = os.path.basename(os.path.dirname(filename)) + "_generator"
+    spec = importlib.util.spec_from_file_location(name, filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def generator_protocols(generator):
+    # (codec prefix, protocol ID) for every protocol the generator writes
+    if hasattr(generator, "id_map"):
+        return [(technology, generator.id_map[technology]) for technology in generator.sources]
+    return [("ezs", generator.PROTOCOL_ID)]
+
+
+def generator_framings(generator, filename):
+    # protocol ID -> framing, with each BGAPI technology's type bits
+    if hasattr(generator, "protocol_framings"):
+        return generator.protocol_framings(os.path.dirname(filename))
+    return {generator.PROTOCOL_ID: generator.FRAMING}
+
+
+def random_values(codec, rng, max_tail, max_payload):
+    """Draw argument values for a packet within each argument's type and declared bounds."""
+    args = dict((arg["name"], arg) for arg in codec["args"])
+    layout = codec["layout"]
+    values = OrderedDict()
+    for field in layout["fields"]:
+        arg = args[field["name"]]
+        if datatypes.is_integer(field["code"]):
+            minimum, maximum = datatypes.integer_range(field["code"])
+            values[field["name"]] = rng.randint(max(minimum, arg.get("minimum", minimum)), min(maximum, arg.get("maximum", maximum)))
+        else:
+            values[field["name"]] = rng.randbytes(datatypes.type_size(field["code"]))
+    if layout["tail"] is not None:
+        arg = args[layout["tail"]["name"]]
+        prefix_maximum = datatypes.integer_range(layout["tail"]["code"])[1]
+        longest = min(prefix_maximum, arg.get("maxlength", prefix_maximum), max_payload - layout["fixed_length"], max_tail)
+        shortest = min(arg.get("minlength", 0), longest)
+        values[layout["tail"]["name"]] = rng.randbytes(rng.randint(shortest, max(shortest, longest)))
+    return values
+
+
+def pick_packets(codecs, rng, count):
+    # a few hot packet types dominate real traffic, so weight them by 1/rank
+    codecs = list(codecs)
+    rng.shuffle(codecs)
+    return rng.choices(codecs, weights=[1.0 / rank for rank in range(1, len(codecs) + 1)], k=count) if codecs else []
+
+
+def synthesize_traffic(codecs, namespace, framing_info, rng, count, event_ratio, max_tail):
+    """Build received frames (events and responses) and outgoing commands with their values."""
+    by_kind = dict((kind, [codec for codec in codecs if codec["kind"] == kind]) for kind in dispatch.PACKET_TYPES)
+    events = sum(1 for _ in range(count) if rng.random() < event_ratio)
+    if not by_kind["event"]:
+        events = 0
+    elif not by_kind["response"]:
+        events = count
+    received = pick_packets(by_kind["event"], rng, events) + pick_packets(by_kind["response"], rng, count - events)
+    rng.shuffle(received)
+    frames = [framing.build_frame(codec, framing_info, random_values(codec, rng, max_tail, framing_info["max_payload"])) for codec in received]
+    commands = [(namespace["%s_pack" % codec["name"]], codec["class_id"], codec["packet_id"],
+        tuple(random_values(codec, rng, max_tail, framing_info["max_payload"]).values())) for codec in pick_packets(by_kind["command"], rng, count)]
+    return frames, commands
+
+
+def make_decoder(namespace, protocol_id, framing_info):
+    table = namespace["dispatch_table"](protocol_id)
+    dispatch_index = namespace["dispatch_index"]
+    header_length = framing_info["header_length"]
+    footer_length = framing_info["footer_length"]
+
+    def decode(frame):
+        return table[dispatch_index(frame)][2](frame[header_length:len(frame) - footer_length])
+
+    return decode
+
+
+def make_encoder(framing_info):
+    command_value = framing_info["command_value"] | framing_info.get("type_value", 0)
+    footer_length = framing_info["footer_length"]
+    frame_checksum = framing.frame_checksum
+
+    def encode(command):
+        pack, class_id, packet_id, values = command
+        payload = pack(*values)
+        frame = bytes((command_value | (len(payload) >> 8), len(payload) & 0xFF, class_id, packet_id)) + payload
+        if footer_length:
+            return frame + bytes((frame_checksum(framing_info, frame),))
+        return frame
+
+    return encode
+
+
+def timer_overhead(samples=100000):
+    clock = time.perf_counter_ns
+    deltas = []
+    for _ in range(samples):
+        start = clock()
+        deltas.append(clock() - start)
+    return statistics.median(deltas)
+
+
+def measure(operation, items, repeat):
+    """Throughput, latency percentiles and allocations of operation over items."""
+    result = OrderedDict([("packets", len(items))])
+    if not items:
+        return result
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            operation(item)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    result["packets_per_second"] = len(items) / best
+
+    # per-packet latency includes one timer call, reported as timer_overhead_ns
+    clock = time.perf_counter_ns
+    latencies = []
+    for item in items:
+        start = clock()
+        operation(item)
+        latencies.append(clock() - start)
+    latencies.sort()
+    for percentile in PERCENTILES:
+        result["latency_ns_p%s" % percentile] = latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
+    result["latency_ns_max"] = latencies[-1]
+
+    # keep every output alive so retained blocks show what each packet costs
+    outputs = [None] * len(items)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    for index, item in enumerate(items):
+        outputs[index] = operation(item)
+    after = tracemalloc.take_snapshot()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    result["alloc_bytes_per_packet"] = sum(stat.size_diff for stat in stats) / len(items)
+    result["alloc_blocks_per_packet"] = sum(stat.count_diff for stat in stats) / len(items)
+    result["alloc_peak_bytes"] = peak
+    del outputs
+    return result
+
+
+def compare(results, baseline):
+    print("%-24s %-8s %14s %14s %8s" % ("protocol", "op", "baseline pkt/s", "pkt/s", "change"))
+    for protocol_id, operations in results["protocols"].items():
+        for operation, result in operations.items():
+            previous = baseline.get("protocols", {}).get(protocol_id, {}).get(operation, {}).get("packets_per_second")
+            if previous is None or "packets_per_second" not in result:
+                continue
+            print("%-24s %-8s %14.0f %14.0f %+7.1f%%" % (protocol_id, operation, previous, result["packets_per_second"],
+                (result["packets_per_second"] / previous - 1) * 100))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generated codecs on synthetic traffic from the definitions")
+    parser.add_argument("--definitions-dir", default=os.path.join(REPO_DIR, "..", "perilib-definitions"), help="directory holding the generated JSON definitions (default: ../perilib-definitions)")
+    parser.add_argument("--protocols", nargs="+", help="only benchmark these protocol IDs")
+    parser.add_argument("--packets", type=int, default=50000, help="packets per protocol and operation (default: 50000)")
+    parser.add_argument("--event-ratio", type=float, default=0.8, help="fraction of received frames that are events rather than responses (default: 0.8)")
+    parser.add_argument("--max-tail", type=int, default=64, help="longest trailing array to synthesize (default: 64)")
+    parser.add_argument("--repeat", type=int, default=3, help="throughput runs per operation, best is kept (default: 3)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="results JSON from an earlier run to compare throughput against")
+    args = parser.parse_args()
+
+    results = OrderedDict([
+        ("meta", OrderedDict([
+            ("timestamp", datetime.datetime.now(datetime.timezone.utc).isoformat()),
+            ("python", platform.python_version()),
+            ("implementation", platform.python_implementation()),
+            ("machine", platform.machine()),
+            ("packets", args.packets),
+            ("event_ratio", args.event_ratio),
+            ("max_tail", args.max_tail),
+            ("seed", args.seed),
+            ("timer_overhead_ns", timer_overhead()),
+        ])),
+        ("protocols", OrderedDict()),
+    ])
+
+    print("%-24s %-8s %12s %9s %9s %9s %11s" % ("protocol", "op", "pkt/s", "p50 ns", "p99 ns", "p99.9 ns", "bytes/pkt"))
+    for filename in GENERATORS:
+        generator = load_generator(filename)
+        definitions_file = os.path.join(args.definitions_dir, os.path.basename(generator.DEFINITIONS_FILE))
+        if not os.path.exists(definitions_file):
+            print("%s: not found, skipping" % definitions_file)
+            continue
+        with open(definitions_file, "r") as f:
+            json_definition = json.load(f, object_pairs_hook=OrderedDict)
+        dedup.resolve_shared(json_definition)
+
+        selected = [(prefix, protocol_id) for prefix, protocol_id in generator_protocols(generator)
+            if protocol_id in json_definition.get("protocols", {}) and (args.protocols is None or protocol_id in args.protocols)]
+        if not selected:
+            continue
+        codecs = struct_codec.build_codecs([(prefix, protocol_id, json_definition["protocols"][protocol_id]) for prefix, protocol_id in selected])
+        namespace = struct_codec.load_module(struct_codec.render_module(codecs, "benchmark") + dispatch.render_tables(codecs, generator.FRAMING))
+        framings = generator_framings(generator, filename)
+
+        for prefix, protocol_id in selected:
+            rng = random.Random("%s:%d" % (protocol_id, args.seed))
+            frames, commands = synthesize_traffic(codecs[protocol_id], namespace, framings[protocol_id], rng, args.packets, args.event_ratio, args.max_tail)
+            results["protocols"][protocol_id] = OrderedDict([
+                ("decode", measure(make_decoder(namespace, protocol_id, framings[protocol_id]), frames, args.repeat)),
+                ("encode", measure(make_encoder(framings[protocol_id]), commands, args.repeat)),
+            ])
+            for operation, result in results["protocols"][protocol_id].items():
+                if "packets_per_second" in result:
+                    print("%-24s %-8s %12.0f %9d %9d %9d %11.1f" % (protocol_id, operation, result["packets_per_second"],
+                        result["latency_ns_p50"], result["latency_ns_p99"], result["latency_ns_p99.9"], result["alloc_bytes_per_packet"]))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,155 +1,283 @@
 #!/usr/bin/env python3
 
 from collections import OrderedDict
+import argparse
 import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from backends import cache, ezs_text, framing, output, struct_codec, validation
+
+DEFINITIONS_FILE = "../../perilib-definitions/cypress_ezserial.json"
+CODECS_FILE = "../../perilib-definitions/cypress_ezserial_codecs.py"
+BINARY_FILE = "../../perilib-definitions/cypress_ezserial.bin"
+C_OUTPUT_DIR = "../../perilib-definitions/c"
+DTYPES_FILE = "../../perilib-definitions/cypress_ezserial_dtypes.py"
+TEXT_PARSER_FILE = "../../perilib-definitions/cypress_ezserial_text.py"
+VALIDATORS_FILE = "../../perilib-definitions/cypress_ezserial_validators.py"
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+# bump whenever load_api() output changes to invalidate cached sources
+GENERATOR_VERSION = "1"
 
-# read original definitions from file
-with open("../../perilib-definitions/cypress_ezserial.json", "r") as f:
-    json_definition = json.load(f, object_pairs_hook=OrderedDict)
-    
 # Bluetooth Low Energy: PSoC 4 BLE, WICED Smart
-with open("ezsapi.json", "r") as f:
-    api = json.load(f, object_pairs_hook=OrderedDict)
-    
-print("EZ-Serial Protocol")
+SOURCE_FILE = "ezsapi.json"
+
+PROTOCOL_ID = "cypress-ezserial"
+
+# EZ-Serial binary frame layout: 4-byte header with type 0x80 (event) or 0xC0
+# (command/response) in the top bits of byte 0, the top 3 bits of the payload
+# length in bits 2-0, and a checksum byte after the payload: 0x99 plus every
+# header and payload byte, modulo 256
+FRAMING = OrderedDict([
+    ("header_length", 4),
+    ("footer_length", 1),
+    ("checksum_initial", 0x99),
+    ("event_mask", 0xC0),
+    ("event_value", 0x80),
+    ("command_value", 0xC0),
+    ("length_high_mask", 0x07),
+    ("max_payload", 0x7FF),
+])
 
-# step through each class
-for group_def in api["groups"]:
-    group_id = str(group_def["id"])
-    print("    %s: %s" % (group_id, group_def["name"]))
+def load_api(filename):
+    with open(filename, "r") as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+def merge_api(json_definition, api):
+    # make sure the protocol skeleton exists, even without original definitions
+    protocol = json_definition.setdefault("protocols", OrderedDict()).setdefault(PROTOCOL_ID, OrderedDict())
+    packets = protocol.setdefault("packets", OrderedDict())
+    for packet_group in ["commands", "events"]:
+        packets.setdefault(packet_group, OrderedDict()).setdefault("entities", OrderedDict())
+
+    print("EZ-Serial Protocol")
+
+    # step through each class
+    for group_def in api["groups"]:
+        group_id = str(group_def["id"])
+        print("    %s: %s" % (group_id, group_def["name"]))
     
-    # step through each /response pair in this group, if any
-    if "commands" in group_def:
-        print("        commands:")
-
-        # add dictionary key for this class ID in the command set
-        if group_id not in json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"]:
-            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id] = OrderedDict()
-
-        # add/update relevant class details
-        json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id]["name"] = group_def["name"]
-
-        for command_def in group_def["commands"]:
-            command_id = str(command_def["id"])
-            if command_id not in json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id]:
-                # command does not exist in definition
-                json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id] = OrderedDict()
-
-            # update name
-            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["name"] = command_def["name"]
-
-            # identify command parameters
-            if command_def["parameters"] is None:
-                json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"] = []
-                param_str = ""
-            else:
-                if "command_args" not in json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]:
+        # step through each /response pair in this group, if any
+        if "commands" in group_def:
+            print("        commands:")
+
+            # add dictionary key for this class ID in the command set
+            if group_id not in json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"]:
+                json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id] = OrderedDict()
+
+            # add/update relevant class details
+            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id]["name"] = group_def["name"]
+
+            for command_def in group_def["commands"]:
+                command_id = str(command_def["id"])
+                if command_id not in json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id]:
+                    # command does not exist in definition
+                    json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id] = OrderedDict()
+
+                # update name
+                json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["name"] = command_def["name"]
+
+                # update text mode name
+                if "textname" in command_def:
+                    json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["textname"] = command_def["textname"]
+
+                # identify command parameters
+                if command_def["parameters"] is None:
                     json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"] = []
-                for index, param in enumerate(command_def["parameters"]):
-                    if len(json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"]) == index:
-                        # argument does not exist in list
-                        json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"].append(OrderedDict())
-                    json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["name"] = param["name"]
-                    json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["type"] = param["type"]
-                    if "format" in param:
-                        json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["format"] = param["format"]
-                    if "shortdesc" in param:
-                        json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["shortdesc"] = param["shortdesc"]
-                    if "minimum" in param:
-                        json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["minimum"] = param["minimum"]
-                    if "maximum" in param:
-                        json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["maximum"] = param["maximum"]
-                param_str = ', '.join(["%s %s" % (param["type"], param["name"]) for param in command_def["parameters"]])
-            print("            %s/%s: ezs_cmd_%s_%s(%s)" % (
-                    group_id,
-                    command_id,
-                    group_def["name"],
-                    command_def["name"],
-                    param_str))
-                    
-            # identify response parameters, if any
-            if "returns" in command_def:
-                if command_def["returns"] is None:
-                    json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"] = []
                     param_str = ""
                 else:
-                    if "response_args" not in json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]:
-                        json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"] = []
-                    for index, param in enumerate(command_def["returns"]):
-                        if len(json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"]) == index:
+                    if "command_args" not in json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]:
+                        json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"] = []
+                    for index, param in enumerate(command_def["parameters"]):
+                        if len(json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"]) == index:
                             # argument does not exist in list
-                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"].append(OrderedDict())
-                        json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["name"] = param["name"]
-                        json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["type"] = param["type"]
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"].append(OrderedDict())
+                        json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["name"] = param["name"]
+                        json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["type"] = param["type"]
+                        if "textname" in param:
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["textname"] = param["textname"]
                         if "format" in param:
-                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["format"] = param["format"]
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["format"] = param["format"]
                         if "shortdesc" in param:
-                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["shortdesc"] = param["shortdesc"]
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["shortdesc"] = param["shortdesc"]
                         if "minimum" in param:
-                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["minimum"] = param["minimum"]
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["minimum"] = param["minimum"]
                         if "maximum" in param:
-                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["maximum"] = param["maximum"]
-                    param_str = ', '.join(["%s %s" % (param["type"], param["name"]) for param in command_def["returns"]])
-                print("            %s/%s: ezs_rsp_%s_%s(%s)" % (
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["maximum"] = param["maximum"]
+                        if "minlength" in param:
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["minlength"] = param["minlength"]
+                        if "maxlength" in param:
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["command_args"][index]["maxlength"] = param["maxlength"]
+                    param_str = ', '.join(["%s %s" % (param["type"], param["name"]) for param in command_def["parameters"]])
+                print("            %s/%s: ezs_cmd_%s_%s(%s)" % (
                         group_id,
                         command_id,
                         group_def["name"],
                         command_def["name"],
                         param_str))
-            else:
-                print("            %d/%d: NOTE: COMMAND HAS NO RESPONSE" % (int(group_def["id"]), int(command_def["id"])))
+                    
+                # identify response parameters, if any
+                if "returns" in command_def:
+                    if command_def["returns"] is None:
+                        json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"] = []
+                        param_str = ""
+                    else:
+                        if "response_args" not in json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]:
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"] = []
+                        for index, param in enumerate(command_def["returns"]):
+                            if len(json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"]) == index:
+                                # argument does not exist in list
+                                json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"].append(OrderedDict())
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["name"] = param["name"]
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["type"] = param["type"]
+                            if "textname" in param:
+                                json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["textname"] = param["textname"]
+                            if "format" in param:
+                                json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["format"] = param["format"]
+                            if "shortdesc" in param:
+                                json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["shortdesc"] = param["shortdesc"]
+                            if "minimum" in param:
+                                json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["minimum"] = param["minimum"]
+                            if "maximum" in param:
+                                json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["maximum"] = param["maximum"]
+                            if "minlength" in param:
+                                json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["minlength"] = param["minlength"]
+                            if "maxlength" in param:
+                                json_definition["protocols"]["cypress-ezserial"]["packets"]["commands"]["entities"][group_id][command_id]["response_args"][index]["maxlength"] = param["maxlength"]
+                        param_str = ', '.join(["%s %s" % (param["type"], param["name"]) for param in command_def["returns"]])
+                    print("            %s/%s: ezs_rsp_%s_%s(%s)" % (
+                            group_id,
+                            command_id,
+                            group_def["name"],
+                            command_def["name"],
+                            param_str))
+                else:
+                    print("            %d/%d: NOTE: COMMAND HAS NO RESPONSE" % (int(group_def["id"]), int(command_def["id"])))
                 
-    # step through each event in this class, if any
-    if "events" in group_def:
-        print("        events:")
-
-        # add dictionary key for this class ID in the event set
-        if group_id not in json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"]:
-            json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id] = OrderedDict()
-
-        # add/update relevant class details
-        json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id]["name"] = group_def["name"]
-
-        for event_def in group_def["events"]:
-            event_id = str(event_def["id"])
-            print(type(event_id))
-            if event_id not in json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id]:
-                # event does not exist in definition
-                json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id] = OrderedDict()
-
-            # update name
-            json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["name"] = event_def["name"]
-
-            # identify event parameters
-            if event_def["parameters"] is None:
-                json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"] = []
-                param_str = ""
-            else:
-                if "event_args" not in json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]:
+        # step through each event in this class, if any
+        if "events" in group_def:
+            print("        events:")
+
+            # add dictionary key for this class ID in the event set
+            if group_id not in json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"]:
+                json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id] = OrderedDict()
+
+            # add/update relevant class details
+            json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id]["name"] = group_def["name"]
+
+            for event_def in group_def["events"]:
+                event_id = str(event_def["id"])
+                print(type(event_id))
+                if event_id not in json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id]:
+                    # event does not exist in definition
+                    json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id] = OrderedDict()
+
+                # update name
+                json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["name"] = event_def["name"]
+
+                # update text mode name
+                if "textname" in event_def:
+                    json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["textname"] = event_def["textname"]
+
+                # identify event parameters
+                if event_def["parameters"] is None:
                     json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"] = []
-                for index, param in enumerate(event_def["parameters"]):
-                    if len(json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"]) == index:
-                        # argument does not exist in list
-                        json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"].append(OrderedDict())
-                    json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["name"] = param["name"]
-                    json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["type"] = param["type"]
-                    if "format" in param:
-                        json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["format"] = param["format"]
-                    if "shortdesc" in param:
-                        json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["shortdesc"] = param["shortdesc"]
-                    if "minimum" in param:
-                        json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["minimum"] = param["minimum"]
-                    if "maximum" in param:
-                        json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["maximum"] = param["maximum"]
-                param_str = ', '.join(["%s %s" % (param["type"], param["name"]) for param in event_def["parameters"]])
-            print("            %s/%s: ezs_evt_%s_%s(%s)" % (
-                    group_id,
-                    event_id,
-                    group_def["name"],
-                    event_def["name"],
-                    param_str))
-
-# write modified definitions back into file
-with open("../../perilib-definitions/cypress_ezserial.json", "w") as f:
-    json.dump(json_definition, f, indent=4)
-    f.write("\n")
+                    param_str = ""
+                else:
+                    if "event_args" not in json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]:
+                        json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"] = []
+                    for index, param in enumerate(event_def["parameters"]):
+                        if len(json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"]) == index:
+                            # argument does not exist in list
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"].append(OrderedDict())
+                        json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["name"] = param["name"]
+                        json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["type"] = param["type"]
+                        if "textname" in param:
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["textname"] = param["textname"]
+                        if "format" in param:
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["format"] = param["format"]
+                        if "shortdesc" in param:
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["shortdesc"] = param["shortdesc"]
+                        if "minimum" in param:
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["minimum"] = param["minimum"]
+                        if "maximum" in param:
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["maximum"] = param["maximum"]
+                        if "minlength" in param:
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["minlength"] = param["minlength"]
+                        if "maxlength" in param:
+                            json_definition["protocols"]["cypress-ezserial"]["packets"]["events"]["entities"][group_id][event_id]["event_args"][index]["maxlength"] = param["maxlength"]
+                    param_str = ', '.join(["%s %s" % (param["type"], param["name"]) for param in event_def["parameters"]])
+                print("            %s/%s: ezs_evt_%s_%s(%s)" % (
+                        group_id,
+                        event_id,
+                        group_def["name"],
+                        event_def["name"],
+                        param_str))
+
+def main():
+    parser = argparse.ArgumentParser(description="Build perilib definitions from the Cypress EZ-Serial API source")
+    parser.add_argument("--codecs", nargs="?", const=CODECS_FILE, help="also write a precompiled struct codec module (default: %s)" % CODECS_FILE)
+    parser.add_argument("--binary", nargs="?", const=BINARY_FILE, help="also write compact binary definitions for lazy per-protocol loading (default: %s)" % BINARY_FILE)
+    parser.add_argument("--no-cache", action="store_true", help="re-parse every source instead of using the parsed-source cache")
+    parser.add_argument("--c-tables", nargs="?", const=C_OUTPUT_DIR, help="also write C descriptor tables, parser and test harness to this directory (default: %s)" % C_OUTPUT_DIR)
+    parser.add_argument("--numpy", nargs="?", const=DTYPES_FILE, help="also write NumPy structured dtypes for bulk decoding of captures (default: %s)" % DTYPES_FILE)
+    parser.add_argument("--text-parser", nargs="?", const=TEXT_PARSER_FILE, help="also write a text mode line parser built from the text names (default: %s)" % TEXT_PARSER_FILE)
+    parser.add_argument("--validators", nargs="?", const=VALIDATORS_FILE, help="also write specialized command validators with batch and trusted modes (default: %s)" % VALIDATORS_FILE)
+    parser.add_argument("--check", action="store_true", help="round-trip sample values through every generated codec and dispatch slot, verify binary definitions, NumPy dtypes, the text parser and validators, and build and run the C harness")
+    args = parser.parse_args()
+
+    # read original definitions from file
+    if os.path.exists(DEFINITIONS_FILE):
+        with open(DEFINITIONS_FILE, "r") as f:
+            json_definition = json.load(f, object_pairs_hook=OrderedDict)
+    else:
+        json_definition = OrderedDict()
+
+    # load the API definition, re-parsing it only if it changed
+    if args.no_cache:
+        api, hit, elapsed = cache.load_uncached(SOURCE_FILE, load_api)
+    else:
+        api, hit, elapsed = cache.SourceCache(CACHE_DIR, GENERATOR_VERSION).load(SOURCE_FILE, load_api)
+
+    merge_api(json_definition, api)
+
+    # add static framing metadata, flagging packets without a static layout
+    layout_problems = framing.annotate_protocol(json_definition["protocols"][PROTOCOL_ID], FRAMING["max_payload"])
+
+    # add argument validation rules from the minimum/maximum and length bounds
+    validation_problems = validation.annotate_protocol(json_definition["protocols"][PROTOCOL_ID], FRAMING["max_payload"])
+
+    print("source cache:")
+    print("    %s: %s (%.1f ms)" % (SOURCE_FILE, cache.cache_status(hit), elapsed * 1000))
+
+    problems = output.report_problems("LAYOUT", "layout", layout_problems)
+    problems += output.report_problems("VALIDATION", "validation", validation_problems)
+
+    # write modified definitions back into file, only if anything changed
+    output.emit(DEFINITIONS_FILE, json.dumps(json_definition, indent=4) + "\n")
+
+    protocols = [("ezs", PROTOCOL_ID, json_definition["protocols"][PROTOCOL_ID])]
+    failures = output.write_binary(args, json_definition)
+
+    if args.text_parser is not None:
+        text_source = ezs_text.render_module(json_definition["protocols"][PROTOCOL_ID], "ezs", "cypress_ezserial")
+        output.emit(args.text_parser, text_source)
+        if args.check:
+            failures += output.report("text parser check", ezs_text.check_parser(json_definition["protocols"][PROTOCOL_ID], "ezs", text_source))
+
+    failures += output.write_validators(args, protocols, "cypress_ezserial")
+
+    if args.codecs is not None or args.c_tables is not None or args.numpy is not None or args.check:
+        codecs = struct_codec.build_codecs(protocols)
+        failures += output.write_codecs(args, codecs, FRAMING, "cypress_ezserial")
+        failures += output.write_c_tables(args, codecs, protocols, {PROTOCOL_ID: FRAMING}, "cypress_ezserial")
+        failures += output.write_numpy(args, codecs, {PROTOCOL_ID: FRAMING}, "cypress_ezserial")
+
+    # exit once every output has been written
+    if args.check and (failures or problems):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
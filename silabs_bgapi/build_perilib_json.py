@@ -1,35 +1,47 @@
 #!/usr/bin/env python3
 
 from collections import OrderedDict
+import argparse
+import concurrent.futures
+import contextlib
+import io
 import json
-import xmltodict
+import os
+import sys
+import xml.etree.ElementTree as ElementTree
 
-api = OrderedDict()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from backends import cache, dedup, framing, output, struct_codec, validation
 
-# read original definitions from file
-with open("../../perilib-definitions/silabs_bgapi.json", "r") as f:
-    json_definition = json.load(f, object_pairs_hook=OrderedDict)
-    
-# Bluetooth Low Energy: Bluegiga BLE112, BLE113, BLE121LR
-with open("bleapi.xml", "r") as f:
-    api["ble"] = xmltodict.parse(f.read(), force_list=['class', 'command', 'event', 'param'])
-    
-# Bluetooth Low Energy (no mesh): Silicon Labs Blue Gecko BGMxxx
-with open("gecko.xml", "r") as f:
-    api["gecko"] = xmltodict.parse(f.read(), force_list=['class', 'command', 'event', 'param'])
+DEFINITIONS_FILE = "../../perilib-definitions/silabs_bgapi.json"
+CODECS_FILE = "../../perilib-definitions/silabs_bgapi_codecs.py"
+BINARY_FILE = "../../perilib-definitions/silabs_bgapi.bin"
+C_OUTPUT_DIR = "../../perilib-definitions/c"
+DTYPES_FILE = "../../perilib-definitions/silabs_bgapi_dtypes.py"
+VALIDATORS_FILE = "../../perilib-definitions/silabs_bgapi_validators.py"
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
 
-# Bluetooth Smart Ready: Bluegiga BT121
-with open("dumoapi.xml", "r") as f:
-    api["dumo"] = xmltodict.parse(f.read(), force_list=['class', 'command', 'event', 'param'])
+# bump whenever load_api() output changes to invalidate cached sources
+GENERATOR_VERSION = "3"
+
+# API source files
+sources = OrderedDict([
+    # Bluetooth Low Energy: Bluegiga BLE112, BLE113, BLE121LR
+    ("ble", "bleapi.xml"),
+
+    # Bluetooth Low Energy (no mesh): Silicon Labs Blue Gecko BGMxxx
+    ("gecko", "gecko.xml"),
+
+    # Bluetooth Smart Ready: Bluegiga BT121
+    ("dumo", "dumoapi.xml"),
+
+    # Wi-Fi: Bluegiga WF121
+    ("wifi121", "wifiapi-wf121.xml"),
+
+    # Wi-Fi: Silicon Labs WGM110
+    ("wifi110", "wifiapi-wgm110.xml"),
+])
 
-# Wi-Fi: Bluegiga WF121
-with open("wifiapi-wf121.xml", "r") as f:
-    api["wifi121"] = xmltodict.parse(f.read(), force_list=['class', 'command', 'event', 'param'])
-    
-# Wi-Fi: Silicon Labs WGM110
-with open("wifiapi-wgm110.xml", "r") as f:
-    api["wifi110"] = xmltodict.parse(f.read(), force_list=['class', 'command', 'event', 'param'])
-    
 # protocol ID mapping
 id_map = {
     "ble": "silabs-bgapi-ble1xx",
@@ -39,12 +51,184 @@ id_map = {
     "wifi110": "silabs-bgapi-wgm110",
 }
 
-# step through each API definition
-for technology in api:
-    print("%s (%s)" % (technology, api[technology]["api"]["@device_id"]))
+# BGAPI frame layout: 4-byte header with the event flag in bit 7 of byte 0,
+# the technology type (the source's <api device_id>) in bits 6-3 and the top
+# 3 bits of the payload length in bits 2-0
+FRAMING = OrderedDict([
+    ("header_length", 4),
+    ("footer_length", 0),
+    ("event_mask", 0x80),
+    ("event_value", 0x80),
+    ("command_value", 0x00),
+    ("type_mask", 0x78),
+    ("length_high_mask", 0x07),
+    ("max_payload", 0x7FF),
+])
+
+def attributes(elem):
+    return OrderedDict(("@" + name, value) for name, value in elem.attrib.items())
+
+def param_list(elem):
+    # same shape as xmltodict: None for an empty block, otherwise a "param" list
+    params = [attributes(param) for param in elem.findall("param")]
+    return OrderedDict([("param", params)]) if params else None
+
+def packet_def(elem):
+    packet = attributes(elem)
+    for block in ["params", "returns"]:
+        child = elem.find(block)
+        if child is not None:
+            packet[block] = param_list(child)
+    return packet
+
+def load_api(filename):
+    # stream the XML one <class> at a time so memory use stays flat for large
+    # vendor APIs; the result has the same shape xmltodict produced
+    api = OrderedDict()
+    root = None
+    for event, elem in ElementTree.iterparse(filename, events=["start", "end"]):
+        if event == "start":
+            if root is None:
+                root = elem
+                api.update(attributes(elem))
+                api["class"] = []
+            continue
+
+        if elem.tag == "datatypes":
+            api["datatypes"] = OrderedDict([("datatype", [attributes(datatype) for datatype in elem.findall("datatype")])])
+        elif elem.tag == "class":
+            class_def = attributes(elem)
+            for tag in ["command", "event"]:
+                packets = [packet_def(child) for child in elem.findall(tag)]
+                if packets:
+                    class_def[tag] = packets
+            enums = [OrderedDict(list(attributes(block).items()) + [("enum", [attributes(enum) for enum in block.findall("enum")])]) for block in elem.findall("enums")]
+            if enums:
+                class_def["enums"] = enums
+            api["class"].append(class_def)
+        else:
+            continue
+
+        # drop the processed subtree
+        root.clear()
+
+    return OrderedDict([("api", api)])
+
+def device_id(filename):
+    # the technology type is an attribute of the root <api> element, so stop
+    # at its start tag
+    for event, elem in ElementTree.iterparse(filename, events=["start"]):
+        return int(elem.attrib["device_id"])
+
+def protocol_framings(directory="."):
+    # protocol ID -> framing with that technology's type bits in header byte 0
+    return OrderedDict((id_map[technology], OrderedDict(FRAMING, type_value=device_id(os.path.join(directory, sources[technology])) << 3))
+        for technology in sources)
+
+def datatype_map(api):
+    # declared datatype name -> base type, from the <datatypes> block
+    return dict((datatype["@name"], datatype["@base"]) for datatype in api["api"]["datatypes"]["datatype"])
+
+def datatype_problems(api):
+    # every parameter's declared datatype must resolve to its wire type
+    type_map = datatype_map(api)
+    problems = []
+    for class_def in api["api"]["class"]:
+        for tag in ["command", "event"]:
+            for packet in class_def.get(tag, []):
+                for block in ["params", "returns"]:
+                    if packet.get(block) is None:
+                        continue
+                    for param in packet[block]["param"]:
+                        if type_map.get(param["@datatype"]) != param["@type"]:
+                            problems.append("%s/%s %s %s_%s: datatype '%s' of argument '%s' does not resolve to '%s'" % (
+                                class_def["@index"], packet["@index"], tag, class_def["@name"], packet["@name"],
+                                param["@datatype"], param["@name"], param["@type"]))
+    return problems
+
+# parameters whose values are listed by an <enums> block of their class but
+# not declared with it as their datatype: (class, packet, parameter) ->
+# (enums name, True if the values are flags that may be combined)
+ENUM_PARAMS = {
+    ("gap", "set_filtering", "scan_policy"): ("scan_policy", False),
+    ("gap", "scan_response", "address_type"): ("address_type", False),
+    ("le_gap", "open", "address_type"): ("address_type", False),
+    ("le_gap", "connect", "address_type"): ("address_type", False),
+    ("le_gap", "bt5_set_mode", "address_type"): ("address_type", False),
+    ("bt_connection", "set_role", "role"): ("role", False),
+    ("bt_connection", "parameters", "role"): ("role", False),
+    ("bt_connection", "parameters", "direction"): ("direction", False),
+    ("bt_connection", "parameters", "powermode"): ("powermode", False),
+    ("bt_connection", "parameters", "encryption"): ("encryption", False),
+    ("bt_hid", "state_changed", "state"): ("state", False),
+    ("bt_hid", "get_report", "report_type"): ("report_type", False),
+    ("bt_hid", "set_report", "report_type"): ("report_type", False),
+    ("bt_hid", "get_report_response", "report_type"): ("report_type", False),
+    ("test", "dtm_tx", "packet_type"): ("packet_type", False),
+    ("test", "dtm_tx", "phy"): ("phy", False),
+    ("test", "dtm_rx", "phy"): ("phy", False),
+    ("homekit", "configure", "category"): ("category", False),
+    ("endpoint", "status", "type"): ("type", True),
+    ("x509", "add_certificate", "store"): ("store", False),
+    ("x509", "certificate", "store"): ("store", False),
+    ("x509", "certificate", "type"): ("type", False),
+}
+
+def enum_sets(api):
+    # (kind, class name, packet name) -> {argument name: validation rule entry}
+    # for parameters declared with an enum datatype or listed in ENUM_PARAMS
+    sets = {}
+    for class_def in api["api"]["class"]:
+        blocks = dict((block["@name"], [int(enum["@value"], 0) for enum in block["enum"]]) for block in class_def.get("enums", []))
+        if not blocks:
+            continue
+        for tag, block_kinds in [("command", [("params", "command"), ("returns", "response")]), ("event", [("params", "event")])]:
+            for packet in class_def.get(tag, []):
+                for block, kind in block_kinds:
+                    if packet.get(block) is None:
+                        continue
+                    for param in packet[block]["param"]:
+                        enum_name, flags = ENUM_PARAMS.get((class_def["@name"], packet["@name"], param["@name"]), (param["@datatype"], False))
+                        if enum_name in blocks:
+                            sets.setdefault((kind, class_def["@name"], packet["@name"]), {})[param["@name"]] = validation.enum_rule(blocks[enum_name], flags)
+    return sets
+
+def process_technology(job):
+    # runs in a worker process: load (or reuse) the parsed source and merge it
+    # into this technology's protocol subtree, capturing the progress output
+    technology, protocol, use_cache = job
+    if use_cache:
+        api, hit, elapsed = cache.SourceCache(CACHE_DIR, GENERATOR_VERSION).load(sources[technology], load_api)
+    else:
+        api, hit, elapsed = cache.load_uncached(sources[technology], load_api)
+
+    json_definition = OrderedDict([("protocols", OrderedDict())])
+    if protocol is not None:
+        json_definition["protocols"][id_map[technology]] = protocol
+    progress = io.StringIO()
+    with contextlib.redirect_stdout(progress):
+        merge_api(json_definition, technology, api)
+
+    # add static framing metadata, flagging packets without a static layout
+    protocol = json_definition["protocols"][id_map[technology]]
+    problems = datatype_problems(api) + framing.annotate_protocol(protocol, FRAMING["max_payload"])
+
+    # add argument validation rules, with enum sets where a parameter matches one
+    validation_problems = validation.annotate_protocol(protocol, FRAMING["max_payload"], enum_sets(api))
+
+    return protocol, progress.getvalue(), hit, elapsed, problems, validation_problems
+
+def merge_api(json_definition, technology, api):
+    # make sure the protocol skeleton exists, even without original definitions
+    protocol = json_definition.setdefault("protocols", OrderedDict()).setdefault(id_map[technology], OrderedDict())
+    packets = protocol.setdefault("packets", OrderedDict())
+    for packet_group in ["commands", "events"]:
+        packets.setdefault(packet_group, OrderedDict()).setdefault("entities", OrderedDict())
+
+    print("%s (%s)" % (technology, api["api"]["@device_id"]))
     
     # step through each class
-    for class_def in api[technology]["api"]["class"]:
+    for class_def in api["api"]["class"]:
         class_id = class_def["@index"]
         print("    %s: %s" % (class_id, class_def["@name"]))
         
@@ -157,7 +341,80 @@ for technology in api:
                         event_def["@name"],
                         param_str))
 
-# write modified definitions back into file
-with open("../../perilib-definitions/silabs_bgapi.json", "w") as f:
-    json.dump(json_definition, f, indent=4)
-    f.write("\n")
+def main():
+    parser = argparse.ArgumentParser(description="Build perilib definitions from Silicon Labs BGAPI XML sources")
+    parser.add_argument("--codecs", nargs="?", const=CODECS_FILE, help="also write a precompiled struct codec module (default: %s)" % CODECS_FILE)
+    parser.add_argument("--binary", nargs="?", const=BINARY_FILE, help="also write compact binary definitions for lazy per-protocol loading (default: %s)" % BINARY_FILE)
+    parser.add_argument("--dedup", action="store_true", help="store packets shared between protocols once in a referenced pool")
+    parser.add_argument("--jobs", type=int, default=None, help="number of worker processes (default: one per CPU, 1 disables the pool)")
+    parser.add_argument("--no-cache", action="store_true", help="re-parse every source instead of using the parsed-source cache")
+    parser.add_argument("--c-tables", nargs="?", const=C_OUTPUT_DIR, help="also write C descriptor tables, parser and test harness to this directory (default: %s)" % C_OUTPUT_DIR)
+    parser.add_argument("--numpy", nargs="?", const=DTYPES_FILE, help="also write NumPy structured dtypes for bulk decoding of captures (default: %s)" % DTYPES_FILE)
+    parser.add_argument("--validators", nargs="?", const=VALIDATORS_FILE, help="also write specialized command validators with batch and trusted modes (default: %s)" % VALIDATORS_FILE)
+    parser.add_argument("--check", action="store_true", help="round-trip sample values through every generated codec and dispatch slot, verify binary definitions, NumPy dtypes and validators, and build and run the C harness")
+    args = parser.parse_args()
+
+    # read original definitions from file
+    if os.path.exists(DEFINITIONS_FILE):
+        with open(DEFINITIONS_FILE, "r") as f:
+            json_definition = json.load(f, object_pairs_hook=OrderedDict)
+
+        # expand packets shared by a previous --dedup run before merging into them
+        dedup.resolve_shared(json_definition, copy_packets=True)
+    else:
+        json_definition = OrderedDict()
+
+    # process each API definition in parallel, re-parsing only sources that
+    # changed, then merge the results back in a fixed order
+    protocols = json_definition.setdefault("protocols", OrderedDict())
+    jobs = [(technology, protocols.get(id_map[technology]), not args.no_cache) for technology in sources]
+    if args.jobs == 1:
+        results = list(map(process_technology, jobs))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(process_technology, jobs))
+
+    cache_report = []
+    layout_problems = []
+    validation_problems = []
+    for technology, (protocol, progress, hit, elapsed, packet_problems, rule_problems) in zip(sources, results):
+        protocols[id_map[technology]] = protocol
+        sys.stdout.write(progress)
+        cache_report.append("    %s: %s (%.1f ms)" % (sources[technology], cache.cache_status(hit), elapsed * 1000))
+        layout_problems += ["%s %s" % (technology, problem) for problem in packet_problems]
+        validation_problems += ["%s %s" % (technology, problem) for problem in rule_problems]
+
+    print("source cache:")
+    print("\n".join(cache_report))
+
+    problems = output.report_problems("LAYOUT", "layout", layout_problems)
+    problems += output.report_problems("VALIDATION", "validation", validation_problems)
+
+    # find packets shared between protocols and report the sharing ratio
+    pooled_definition, sharing = dedup.share_packets(json_definition)
+    print("packet sharing:")
+    for technology in sources:
+        shared, total = sharing[id_map[technology]]
+        print("    %s: %d/%d packets shared (%.1f%%)" % (technology, shared, total, 100.0 * shared / total if total else 0.0))
+    print("    pool: %d packets" % len(pooled_definition[dedup.POOL_KEY]))
+
+    # write modified definitions back into file, only if anything changed
+    output.emit(DEFINITIONS_FILE, json.dumps(pooled_definition if args.dedup else json_definition, indent=4) + "\n")
+
+    protocols = [(technology, id_map[technology], json_definition["protocols"][id_map[technology]]) for technology in sources]
+    failures = output.write_binary(args, json_definition)
+    failures += output.write_validators(args, protocols, "silabs_bgapi")
+
+    if args.codecs is not None or args.c_tables is not None or args.numpy is not None or args.check:
+        codecs = struct_codec.build_codecs(protocols)
+        framings = protocol_framings()
+        failures += output.write_codecs(args, codecs, FRAMING, "silabs_bgapi")
+        failures += output.write_c_tables(args, codecs, protocols, framings, "silabs_bgapi")
+        failures += output.write_numpy(args, codecs, framings, "silabs_bgapi")
+
+    # exit once every output has been written
+    if args.check and (failures or problems):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Build definition trees from the bundled API sources the way the generators
+# do, with layout and validation entries, but without the parsed-source cache
+# or any output file.
+
+from collections import OrderedDict
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO_DIR)
+from backends import framing, validation
+
+
+def load_generator(directory):
+    filename = os.path.join(REPO_DIR, directory, "build_perilib_json.py")
+    spec = importlib.util.spec_from_file_location(directory + "_generator", filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bgapi_definition():
+    """Return (generator module, definition tree of all five BGAPI sources)."""
+    generator = load_generator("silabs_bgapi")
+    json_definition = OrderedDict([("protocols", OrderedDict())])
+    for technology in generator.sources:
+        api = generator.load_api(os.path.join(REPO_DIR, "silabs_bgapi", generator.sources[technology]))
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator.merge_api(json_definition, technology, api)
+        protocol = json_definition["protocols"][generator.id_map[technology]]
+        framing.annotate_protocol(protocol, generator.FRAMING["max_payload"])
+        validation.annotate_protocol(protocol, generator.FRAMING["max_payload"], generator.enum_sets(api))
+    return generator, json_definition
+
+
+def ezserial_definition():
+    """Return (generator module, definition tree of ezsapi.json)."""
+    generator = load_generator("cypress_ezserial")
+    api = generator.load_api(os.path.join(REPO_DIR, "cypress_ezserial", generator.SOURCE_FILE))
+    json_definition = OrderedDict()
+    with contextlib.redirect_stdout(io.StringIO()):
+        generator.merge_api(json_definition, api)
+    protocol = json_definition["protocols"][generator.PROTOCOL_ID]
+    framing.annotate_protocol(protocol, generator.FRAMING["max_payload"])
+    validation.annotate_protocol(protocol, generator.FRAMING["max_payload"])
+    return generator, json_definition
@@ -0,0 +1,71 @@
+# Encode the definitions built from every bundled API source into the binary
+# format and decode them back, as --binary --check does.
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sources import bgapi_definition, ezserial_definition
+from backends import binary
+from backends.definitions import iter_packet_defs
+
+
+class BinaryDefinitionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, "definitions.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, json_definition):
+        with open(self.filename, "wb") as f:
+            f.write(binary.encode_definitions(json_definition))
+
+    def test_round_trip(self):
+        for source in [bgapi_definition, ezserial_definition]:
+            generator, json_definition = source()
+            with self.subTest(generator=generator.__name__):
+                self.write(json_definition)
+                self.assertEqual(binary.check_definitions(json_definition, self.filename), [])
+                with binary.BinaryDefinitions(self.filename) as definitions:
+                    self.assertEqual(definitions.protocol_ids(), list(json_definition["protocols"]))
+
+    def test_classes_decode_lazily(self):
+        generator, json_definition = ezserial_definition()
+        self.write(json_definition)
+        with binary.BinaryDefinitions(self.filename) as definitions:
+            protocol = definitions.protocol(generator.PROTOCOL_ID)
+            self.assertIs(definitions.protocol(generator.PROTOCOL_ID), protocol)
+            entities = protocol["packets"]["commands"]["entities"]
+            self.assertIsInstance(entities, binary.LazyEntities)
+            class_id = next(iter(entities))
+            self.assertEqual(entities[class_id], json_definition["protocols"][generator.PROTOCOL_ID]["packets"]["commands"]["entities"][class_id])
+
+    def test_mismatch_is_reported(self):
+        generator, json_definition = ezserial_definition()
+        self.write(json_definition)
+        packet_def = next(iter_packet_defs(json_definition["protocols"][generator.PROTOCOL_ID]))[-1]
+        packet_def["name"] += "_changed"
+        json_definition["version"] = 2
+        self.assertEqual(binary.check_definitions(json_definition, self.filename), [
+            "%s: binary definitions differ from JSON" % generator.PROTOCOL_ID,
+            "top-level metadata differs from JSON",
+        ])
+        del json_definition["protocols"][generator.PROTOCOL_ID]
+        json_definition["protocols"]["other"] = {}
+        self.assertEqual(binary.check_definitions(json_definition, self.filename)[0], "other: missing from binary definitions")
+
+    def test_not_a_definition_file(self):
+        with open(self.filename, "wb") as f:
+            f.write(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            binary.BinaryDefinitions(self.filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
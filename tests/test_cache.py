@@ -0,0 +1,111 @@
+# Check the parsed-source cache and change-only output writes in a temporary
+# directory.
+
+import os
+import sys
+import tempfile
+import unittest
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO_DIR)
+from backends import cache
+
+
+class SourceCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, ".cache")
+        self.source = os.path.join(self.temp_dir.name, "api.xml")
+        self.write_source(b"<api/>")
+        self.parsed = []
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_source(self, data):
+        with open(self.source, "wb") as f:
+            f.write(data)
+
+    def parse(self, filename):
+        with open(filename, "rb") as f:
+            data = f.read()
+        self.parsed.append(data)
+        return {"source": data}
+
+    def entries(self):
+        return sorted(os.listdir(self.cache_dir))
+
+    def test_hit_on_identical_bytes(self):
+        source_cache = cache.SourceCache(self.cache_dir, "1")
+        parsed, hit, elapsed = source_cache.load(self.source, self.parse)
+        self.assertFalse(hit)
+        parsed, hit, elapsed = source_cache.load(self.source, self.parse)
+        self.assertTrue(hit)
+        self.assertEqual(parsed, {"source": b"<api/>"})
+        self.assertEqual(self.parsed, [b"<api/>"])
+
+    def test_miss_after_content_change(self):
+        source_cache = cache.SourceCache(self.cache_dir, "1")
+        source_cache.load(self.source, self.parse)
+        self.write_source(b"<api device_id=\"4\"/>")
+        parsed, hit, elapsed = source_cache.load(self.source, self.parse)
+        self.assertFalse(hit)
+        self.assertEqual(parsed, {"source": b"<api device_id=\"4\"/>"})
+        self.assertEqual(len(self.parsed), 2)
+
+    def test_miss_after_version_bump(self):
+        cache.SourceCache(self.cache_dir, "1").load(self.source, self.parse)
+        parsed, hit, elapsed = cache.SourceCache(self.cache_dir, "2").load(self.source, self.parse)
+        self.assertFalse(hit)
+        self.assertEqual(len(self.parsed), 2)
+
+    def test_stale_entries_removed(self):
+        source_cache = cache.SourceCache(self.cache_dir, "1")
+        source_cache.load(self.source, self.parse)
+        first = self.entries()
+        self.write_source(b"<api device_id=\"1\"/>")
+        source_cache.load(self.source, self.parse)
+        self.assertEqual(len(self.entries()), 1)
+        self.assertNotEqual(self.entries(), first)
+
+        # entries of other sources are kept
+        other = os.path.join(self.temp_dir.name, "other.xml")
+        with open(other, "wb") as f:
+            f.write(b"<api/>")
+        source_cache.load(other, self.parse)
+        self.assertEqual(len(self.entries()), 2)
+
+    def test_uncached(self):
+        parsed, hit, elapsed = cache.load_uncached(self.source, self.parse)
+        self.assertEqual(parsed, {"source": b"<api/>"})
+        self.assertIsNone(hit)
+        self.assertFalse(os.path.exists(self.cache_dir))
+        self.assertEqual([cache.cache_status(hit) for hit in (None, True, False)], ["uncached", "hit", "miss"])
+
+
+class WriteIfChangedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.temp_dir.name, "definitions.json")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_unchanged_output_keeps_mtime(self):
+        self.assertTrue(cache.write_if_changed(self.filename, "{}\n"))
+        os.utime(self.filename, (1000000000, 1000000000))
+        self.assertFalse(cache.write_if_changed(self.filename, b"{}\n"))
+        self.assertEqual(os.stat(self.filename).st_mtime, 1000000000)
+
+    def test_changed_output_replaced(self):
+        cache.write_if_changed(self.filename, "{}\n")
+        self.assertTrue(cache.write_if_changed(self.filename, "{\"protocols\": {}}\n"))
+        with open(self.filename, "rb") as f:
+            self.assertEqual(f.read(), b"{\"protocols\": {}}\n")
+        self.assertEqual(os.listdir(self.temp_dir.name), ["definitions.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
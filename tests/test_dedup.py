@@ -0,0 +1,71 @@
+# Check that pooling shared packets across the BGAPI variants and resolving
+# the pool again gives back the original definitions.
+
+from collections import OrderedDict
+import copy
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sources import bgapi_definition
+from backends import dedup
+
+
+class SharePacketsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.generator, cls.json_definition = bgapi_definition()
+        cls.pooled, cls.sharing = dedup.share_packets(cls.json_definition)
+
+    def resolved(self, **kwargs):
+        # go through JSON text, as a --dedup definitions file does
+        pooled = json.loads(json.dumps(self.pooled), object_pairs_hook=OrderedDict)
+        return dedup.resolve_shared(pooled, **kwargs)
+
+    def shared_entries(self, json_definition):
+        # digest -> every packet entry that refers to it in the pooled tree
+        entries = OrderedDict()
+        for protocol_id in self.pooled["protocols"]:
+            for group in ["commands", "events"]:
+                classes = self.pooled["protocols"][protocol_id]["packets"][group]["entities"]
+                for class_id in classes:
+                    for packet_id in classes[class_id]:
+                        packet_def = classes[class_id][packet_id]
+                        if packet_id.isdigit() and dedup.REF_KEY in packet_def:
+                            resolved = json_definition["protocols"][protocol_id]["packets"][group]["entities"][class_id][packet_id]
+                            entries.setdefault(packet_def[dedup.REF_KEY], []).append(resolved)
+        return entries
+
+    def test_round_trip(self):
+        self.assertTrue(self.pooled[dedup.POOL_KEY])
+        self.assertEqual(self.resolved(), self.json_definition)
+        self.assertEqual(self.resolved(copy_packets=True), self.json_definition)
+
+    def test_sharing_report(self):
+        self.assertEqual(list(self.sharing), [self.generator.id_map[technology] for technology in self.generator.sources])
+        self.assertTrue(any(shared for shared, total in self.sharing.values()))
+
+    def test_shared_objects(self):
+        entries = self.shared_entries(self.resolved())
+        self.assertEqual(set(entries), set(self.pooled[dedup.POOL_KEY]))
+        for digest in entries:
+            self.assertGreater(len(entries[digest]), 1)
+            self.assertTrue(all(packet_def is entries[digest][0] for packet_def in entries[digest]))
+
+    def test_copied_packets(self):
+        json_definition = self.resolved(copy_packets=True)
+        for digest, packet_defs in self.shared_entries(json_definition).items():
+            self.assertEqual(len(set(map(id, packet_defs))), len(packet_defs))
+
+        # changing one copy leaves the other protocols alone
+        packet_defs = next(iter(self.shared_entries(json_definition).values()))
+        original = copy.deepcopy(packet_defs[1])
+        packet_defs[0]["name"] += "_changed"
+        self.assertEqual(packet_defs[1], original)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+# Format and re-parse text mode lines for every EZ-Serial packet, as
+# --text-parser --check does.
+
+from collections import OrderedDict
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sources import ezserial_definition
+from backends import ezs_text
+
+
+class TextParserTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        generator, json_definition = ezserial_definition()
+        cls.protocol = json_definition["protocols"][generator.PROTOCOL_ID]
+        cls.source = ezs_text.render_module(cls.protocol, "ezs", "cypress_ezserial")
+
+    def parse_line(self, line, source=None):
+        namespace = {}
+        exec(compile(source or self.source, "<text>", "exec"), namespace)
+        return namespace["parse_line"](line)
+
+    def test_check_parser(self):
+        self.assertEqual(ezs_text.check_parser(self.protocol, "ezs", self.source), [])
+
+    def test_check_parser_reports_failures(self):
+        failures = ezs_text.check_parser(self.protocol, "ezs", self.source + "EVENTS.clear()\n")
+        self.assertTrue(failures)
+        self.assertTrue(all(failure.startswith("ezs_evt_") for failure in failures))
+
+    def test_format_line(self):
+        args = [
+            OrderedDict([("name", "runtime"), ("type", "uint32"), ("textname", "R")]),
+            OrderedDict([("name", "fraction"), ("type", "uint16"), ("textname", "F")]),
+        ]
+        values = {"runtime": 0x1234, "fraction": 0x56}
+        self.assertEqual(ezs_text.format_line("command", "/PING", args, values), "/PING,R=1234,F=56\r\n")
+        self.assertEqual(ezs_text.format_line("response", "/PING", args, values, 0x20), "@R,0016,/PING,0020,R=1234,F=56\r\n")
+        self.assertEqual(ezs_text.format_line("event", "BOOT", args, values), "@E,0010,BOOT,R=1234,F=56\r\n")
+
+    def test_format_values(self):
+        args = [
+            OrderedDict([("name", "rssi"), ("type", "int8"), ("textname", "R")]),
+            OrderedDict([("name", "address"), ("type", "macaddr"), ("textname", "A")]),
+            OrderedDict([("name", "data"), ("type", "uint8a"), ("textname", "D")]),
+            OrderedDict([("name", "name"), ("type", "uint8a"), ("textname", "N"), ("format", "string")]),
+        ]
+        values = {"rssi": -64, "address": bytes.fromhex("0605040302F1"), "data": b"\x01\xab", "name": b"perilib"}
+        self.assertEqual(ezs_text.format_line("command", "TEST", args, values), "TEST,R=C0,A=F10203040506,D=01AB,N=perilib\r\n")
+
+    def test_parse_line(self):
+        self.assertEqual(self.parse_line("@R,0016,/PING,0020,R=1234,F=56\r\n"), ("ezs_rsp_system_ping", {"runtime": 0x1234, "fraction": 0x56, "result": 0x20}))
+        # fields out of order take the keyed fallback
+        self.assertEqual(self.parse_line("@R,0016,/PING,0000,F=56,R=1234\r\n"), ("ezs_rsp_system_ping", {"runtime": 0x1234, "fraction": 0x56, "result": 0}))
+        self.assertIsNone(self.parse_line("@E,0005,NOPE\r\n"))
+        self.assertIsNone(self.parse_line("NOPE,A=1\r\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
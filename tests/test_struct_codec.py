@@ -0,0 +1,110 @@
+# Round-trip the struct codecs built from every bundled API source, and check
+# the layout errors that keep a packet out of the codec module.
+
+from collections import OrderedDict
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import unittest
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO_DIR)
+from backends import c_tables, datatypes, framing, numpy_dtype, struct_codec
+
+
+def load_generator(directory):
+    filename = os.path.join(REPO_DIR, directory, "build_perilib_json.py")
+    spec = importlib.util.spec_from_file_location(directory + "_generator", filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# BGAPI-style framing for the hand-built protocol below
+FRAMING = OrderedDict([
+    ("header_length", 4),
+    ("footer_length", 0),
+    ("event_mask", 0x80),
+    ("event_value", 0x80),
+    ("command_value", 0x00),
+    ("length_high_mask", 0x07),
+    ("max_payload", 0x7FF),
+])
+
+
+def round_trip(protocols, max_payload):
+    # layout entries decide which packets get a codec, as in the generators
+    for prefix, protocol_id, protocol in protocols:
+        framing.annotate_protocol(protocol, max_payload)
+    codecs = struct_codec.build_codecs(protocols)
+    namespace = struct_codec.load_module(struct_codec.render_module(codecs, "test"))
+    return codecs, struct_codec.check_round_trip(codecs, namespace)
+
+
+class SourceRoundTripTest(unittest.TestCase):
+
+    def test_bgapi_sources(self):
+        generator = load_generator("silabs_bgapi")
+        for technology in generator.sources:
+            with self.subTest(source=generator.sources[technology]):
+                api = generator.load_api(os.path.join(REPO_DIR, "silabs_bgapi", generator.sources[technology]))
+                json_definition = OrderedDict()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generator.merge_api(json_definition, technology, api)
+                protocol_id = generator.id_map[technology]
+                codecs, failures = round_trip([(technology, protocol_id, json_definition["protocols"][protocol_id])], generator.FRAMING["max_payload"])
+                self.assertTrue(codecs[protocol_id])
+                self.assertEqual(failures, [])
+
+    def test_ezserial_source(self):
+        generator = load_generator("cypress_ezserial")
+        api = generator.load_api(os.path.join(REPO_DIR, "cypress_ezserial", generator.SOURCE_FILE))
+        json_definition = OrderedDict()
+        with contextlib.redirect_stdout(io.StringIO()):
+            generator.merge_api(json_definition, api)
+        codecs, failures = round_trip([("ezs", generator.PROTOCOL_ID, json_definition["protocols"][generator.PROTOCOL_ID])], generator.FRAMING["max_payload"])
+        self.assertTrue(codecs[generator.PROTOCOL_ID])
+        self.assertEqual(failures, [])
+
+
+class PacketLayoutErrorTest(unittest.TestCase):
+
+    def test_argument_after_tail(self):
+        args = [{"name": "data", "type": "uint8array"}, {"name": "handle", "type": "uint8"}]
+        with self.assertRaisesRegex(ValueError, "follows variable-length argument 'data'"):
+            datatypes.packet_layout(args)
+
+    def test_unknown_type(self):
+        args = [{"name": "handle", "type": "uint24"}]
+        with self.assertRaisesRegex(ValueError, "unknown datatype 'uint24'"):
+            datatypes.packet_layout(args)
+
+    def test_packet_without_layout_is_left_out(self):
+        # system_set_name uses a declared datatype instead of its wire type
+        protocol = OrderedDict([("packets", OrderedDict([
+            ("commands", OrderedDict([("entities", OrderedDict([("1", OrderedDict([
+                ("name", "system"),
+                ("0", OrderedDict([("name", "hello"), ("command_args", []), ("response_args", [])])),
+                ("1", OrderedDict([
+                    ("name", "set_name"),
+                    ("command_args", [{"name": "name", "type": "ser_name"}]),
+                    ("response_args", [{"name": "result", "type": "uint16"}]),
+                ])),
+            ]))]))])),
+            ("events", OrderedDict([("entities", OrderedDict())])),
+        ]))])
+        problems = framing.annotate_protocol(protocol, FRAMING["max_payload"])
+        self.assertEqual(problems, ["1/1 command system_set_name: unknown datatype 'ser_name' for argument 'name'"])
+
+        codecs = struct_codec.build_codecs([("test", "test", protocol)])
+        self.assertEqual([codec["name"] for codec in codecs["test"]], ["test_cmd_system_hello", "test_rsp_system_hello", "test_rsp_system_set_name"])
+        namespace = struct_codec.load_module(struct_codec.render_module(codecs, "test"))
+        self.assertEqual(struct_codec.check_round_trip(codecs, namespace), [])
+        self.assertNotIn("test_cmd_system_set_name", c_tables.render(codecs, {"test": "test"}, {"test": FRAMING}, "test")["test_tables.c"])
+        self.assertIn("test_rsp_system_set_name", numpy_dtype.render_module(codecs, {"test": FRAMING}, "test"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+# Probe the command validators built from every bundled API source with
+# boundary and out-of-rule values, as --validators --check does.
+
+from collections import OrderedDict
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sources import bgapi_definition, ezserial_definition
+from backends import validation
+from backends.definitions import iter_packet_defs
+
+
+def protocol_list(generator, json_definition):
+    # (prefix, protocol ID, protocol) tuples, as the generators pass them
+    if hasattr(generator, "id_map"):
+        return [(technology, generator.id_map[technology], json_definition["protocols"][generator.id_map[technology]]) for technology in generator.sources]
+    return [("ezs", generator.PROTOCOL_ID, json_definition["protocols"][generator.PROTOCOL_ID])]
+
+
+class CheckValidatorsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.protocols = OrderedDict()
+        for source in [bgapi_definition, ezserial_definition]:
+            generator, json_definition = source()
+            cls.protocols[generator.__name__] = protocol_list(generator, json_definition)
+
+    def test_check_validators(self):
+        for name, protocols in self.protocols.items():
+            with self.subTest(generator=name):
+                self.assertEqual(validation.check_validators(protocols, validation.render_module(protocols, name)), [])
+
+    def test_enum_rules_are_probed(self):
+        # the BGAPI enum blocks give both kinds of enum rule
+        rules = [rule for prefix, protocol_id, protocol in self.protocols["silabs_bgapi_generator"]
+            for kind, class_id, class_name, packet_id, packet_def in iter_packet_defs(protocol)
+            for rule in packet_def.get(validation.VALIDATION_KEYS[kind], [])]
+        self.assertTrue(any("values" in rule for rule in rules))
+        self.assertTrue(any("mask" in rule for rule in rules))
+
+    def test_accepting_validators_are_reported(self):
+        protocols = self.protocols["cypress_ezserial_generator"]
+        source = validation.render_module(protocols, "cypress_ezserial")
+        source += "for _validators in VALIDATORS.values():\n    for _name in _validators:\n        _validators[_name] = lambda *values: None\n"
+        failures = validation.check_validators(protocols, source)
+        self.assertTrue(failures)
+        self.assertTrue(all(" accepted" in failure for failure in failures))
+
+
+class RuleValueTest(unittest.TestCase):
+
+    def test_range(self):
+        rule = OrderedDict([("name", "value"), ("minimum", -5), ("maximum", 10)])
+        self.assertEqual([validation._valid_value(rule, variant) for variant in range(2)], [-5, 10])
+        self.assertEqual(validation._invalid_value(rule), 11)
+
+    def test_enum_values(self):
+        rule = OrderedDict([("name", "mode"), ("minimum", 0), ("maximum", 255)])
+        rule.update(validation.enum_rule([2, 0, 2, 1]))
+        self.assertEqual(rule["values"], [0, 1, 2])
+        self.assertEqual([validation._valid_value(rule, variant) for variant in range(4)], [0, 1, 2, 0])
+        self.assertEqual(validation._invalid_value(rule), 3)
+        # every value in range is valid, so there is nothing to probe
+        rule = OrderedDict([("name", "flag"), ("minimum", 0), ("maximum", 1), ("values", [0, 1])])
+        self.assertIsNone(validation._invalid_value(rule))
+
+    def test_flag_mask(self):
+        rule = OrderedDict([("name", "flags"), ("minimum", 0), ("maximum", 255)])
+        rule.update(validation.enum_rule([1, 4], flags=True))
+        self.assertEqual(rule["mask"], 5)
+        self.assertEqual([validation._valid_value(rule, variant) for variant in range(2)], [0, 5])
+        self.assertEqual(validation._invalid_value(rule), 2)
+        # a mask wider than the field only leaves 0 as a known-good value
+        rule = OrderedDict([("name", "flags"), ("minimum", 0), ("maximum", 1), ("mask", 0x101)])
+        self.assertEqual(validation._valid_value(rule, 1), 0)
+        self.assertIsNone(validation._invalid_value(rule))
+
+    def test_lengths(self):
+        rule = OrderedDict([("name", "address"), ("length", 6)])
+        self.assertEqual(validation._valid_value(rule, 1), bytes(6))
+        self.assertIsNone(validation._invalid_value(rule))
+        rule = OrderedDict([("name", "data"), ("minlength", 1), ("maxlength", 3)])
+        self.assertEqual([validation._valid_value(rule, variant) for variant in range(2)], [bytes(1), bytes(3)])
+        self.assertEqual(validation._invalid_value(rule), bytes(4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+# Bulk-decode a binary capture of received frames using a generated dtype
+# module (build_perilib_json.py --numpy). The capture is memory-mapped, frame
+# boundaries are indexed in a single pass, frames are grouped by dispatch
+# index and every group is decoded into columns with one numpy.frombuffer.
+#
+# The capture must start on a frame boundary; a final frame that runs past
+# the end of the file is ignored.
+
+from array import array
+from collections import OrderedDict
+import argparse
+import importlib.util
+import mmap
+import time
+
+import numpy
+
+
+def load_dtype_module(filename):
+    spec = importlib.util.spec_from_file_location("perilib_dtypes", filename)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def index_frames(buffer, dtypes, chunk_size=1 << 24):
+    """Return (offsets, sizes, dispatch indexes) of every complete frame as numpy arrays.
+
+    The frame size a header would announce is computed for every byte
+    position of a chunk at once; the single pass then only hops from one
+    frame start to the next.
+    """
+    raw = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    end = len(raw)
+    header_length = dtypes.HEADER_LENGTH
+    footer_length = dtypes.FOOTER_LENGTH
+
+    offsets = array("q")
+    append = offsets.append
+    position = 0
+    while position + header_length <= end:
+        chunk_end = min(end, position + chunk_size)
+        first = raw[position:chunk_end].astype(numpy.uint16)
+        second = numpy.zeros(chunk_end - position, dtype=numpy.uint16)
+        second[:min(end, chunk_end + 1) - position - 1] = raw[position + 1:min(end, chunk_end + 1)]
+        steps = memoryview(((first & dtypes.LENGTH_HIGH_MASK) << 8 | second) + (header_length + footer_length))
+
+        relative = 0
+        limit = chunk_end - position
+        while relative < limit:
+            append(position + relative)
+            relative += steps[relative]
+        position += relative
+
+    offsets = numpy.frombuffer(offsets, dtype=numpy.int64)
+
+    # drop a trailing frame whose header or body runs past the end
+    offsets = offsets[offsets + header_length <= end]
+    first = raw[offsets].astype(numpy.int64)
+    sizes = ((first & dtypes.LENGTH_HIGH_MASK) << 8 | raw[offsets + 1]) + header_length + footer_length
+    complete = offsets + sizes <= end
+    offsets, first, sizes = offsets[complete], first[complete], sizes[complete]
+
+    packet_types = numpy.where(first & dtypes.EVENT_MASK == dtypes.EVENT_VALUE, dtypes.PACKET_TYPE_EVENT, dtypes.PACKET_TYPE_RESPONSE)
+    indexes = packet_types << 16 | raw[offsets + 2].astype(numpy.int64) << 8 | raw[offsets + 3]
+    return offsets, sizes, indexes
+
+
+def decode_groups(buffer, frame_index, packets, dtypes):
+    """Decode every known packet type into columns.
+
+    Returns an OrderedDict of packet name to OrderedDict of column arrays.
+    Trailing arrays are returned as "<name>_offset" (absolute offset in the
+    capture) alongside their "<name>_length" column. Frames whose size does
+    not match their layout are dropped and counted under "malformed".
+    """
+    offsets, sizes, indexes = frame_index
+    raw = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    order = numpy.argsort(indexes, kind="stable")
+    keys, starts, counts = numpy.unique(indexes[order], return_index=True, return_counts=True)
+
+    groups = OrderedDict()
+    unknown = malformed = 0
+    for key, start, count in zip(keys.tolist(), starts.tolist(), counts.tolist()):
+        members = order[start:start + count]
+        if key not in packets:
+            unknown += count
+            continue
+        name, dtype, tail = packets[key]
+
+        # gather each frame's fixed part into one contiguous block through a
+        # sliding-window view, which avoids building a per-byte index array
+        group_offsets = offsets[members]
+        windows = numpy.lib.stride_tricks.as_strided(raw, shape=(len(raw) - dtype.itemsize + 1, dtype.itemsize), strides=(1, 1))
+        block = windows[group_offsets]
+        records = numpy.frombuffer(block, dtype=dtype)
+
+        expected = dtype.itemsize + dtypes.FOOTER_LENGTH
+        if tail is not None:
+            expected = expected + records[dtypes.LENGTH_FIELD].astype(numpy.int64)
+        valid = sizes[members] == expected
+        if not valid.all():
+            malformed += int(count - valid.sum())
+            records = records[valid]
+            group_offsets = group_offsets[valid]
+
+        columns = OrderedDict()
+        for field in dtype.names:
+            if field == dtypes.HEADER_FIELD:
+                continue
+            if field == dtypes.LENGTH_FIELD:
+                columns["%s_length" % tail] = records[field]
+                columns["%s_offset" % tail] = group_offsets + dtype.itemsize
+            else:
+                columns[field] = records[field]
+        groups[name] = columns
+
+    return groups, unknown, malformed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-decode a binary capture of received frames")
+    parser.add_argument("capture", help="capture file containing back-to-back frames")
+    parser.add_argument("dtypes", help="dtype module written by build_perilib_json.py --numpy")
+    parser.add_argument("protocol_id", help="protocol of the captured device, e.g. silabs-bgapi-bgm1xx")
+    parser.add_argument("--save", help="write all columns to this .npz file as <packet>.<column>")
+    args = parser.parse_args()
+
+    dtypes = load_dtype_module(args.dtypes)
+    with open(args.capture, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    start = time.perf_counter()
+    frame_index = index_frames(buffer, dtypes)
+    indexed = time.perf_counter()
+    groups, unknown, malformed = decode_groups(buffer, frame_index, dtypes.PACKETS[args.protocol_id], dtypes)
+    decoded = time.perf_counter()
+
+    for name in groups:
+        print("%-60s %10d" % (name, len(next(iter(groups[name].values()))) if groups[name] else 0))
+    print("%d frames: indexed in %.2f s, decoded in %.2f s, %d unknown, %d malformed" % (
+        len(frame_index[0]), indexed - start, decoded - indexed, unknown, malformed))
+
+    if args.save:
+        numpy.savez(args.save, **dict(("%s.%s" % (name, column), groups[name][column]) for name in groups for column in groups[name]))
+
+
+if __name__ == "__main__":
+    main()